@@ -3,26 +3,127 @@ Agentic Note Synthesizer for EduScribe
 Combines multiple transcription chunks into structured, coherent notes
 """
 import asyncio
-from typing import List, Dict, Any, Optional
+import hashlib
+import re
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Tuple, Deque, Callable, Awaitable
+import numpy as np
 from app.core.config import settings
+from app.services.semantic_prompt_cache import WINDOW_CHARS
 
 try:
-    from groq import Groq
+    from groq import AsyncGroq
     GROQ_AVAILABLE = True
 except Exception:
     GROQ_AVAILABLE = False
 
-# Initialize Groq client
-groq_client = None
+try:
+    from transformers import AutoTokenizer
+    TOKENIZER_AVAILABLE = True
+except Exception:
+    TOKENIZER_AVAILABLE = False
+
+# Initialize async Groq client (no threadpool worker held per call)
+async_groq_client = None
 if GROQ_AVAILABLE and settings.GROQ_API_KEY:
-    groq_client = Groq(api_key=settings.GROQ_API_KEY)
+    async_groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+
+# Caps in-flight Groq calls (created lazily on the running event loop)
+_groq_semaphore: Optional[asyncio.Semaphore] = None
+
+# Keywords that indicate topic transitions
+TRANSITION_KEYWORDS = [
+    "now let's move on",
+    "next topic",
+    "moving on to",
+    "let's discuss",
+    "now we'll talk about",
+    "switching to",
+    "another important topic"
+]
+
+_TOPIC_SHIFT_RE = re.compile("|".join(map(re.escape, TRANSITION_KEYWORDS)), re.IGNORECASE)
+
+# Static prompt text is byte-identical across calls and sent before any
+# per-call content, so provider-side prefix caching can reuse its prefill.
+SYSTEM_PROMPT = """You are an expert educational note-taker who MUST fix transcription errors and create accurate, educational notes.
+
+CRITICAL RULES:
+1. The transcription is FULL OF ERRORS from speech recognition (wrong words, grammar mistakes, nonsense phrases)
+2. Your job is to UNDERSTAND what the speaker ACTUALLY meant and write CORRECT notes
+3. DO NOT copy the transcription errors - FIX THEM!
+4. Use the document context to understand correct terminology and concepts
+5. Write clear, accurate, educational notes that make sense
+
+EXAMPLE OF WHAT YOU MUST DO:
+❌ BAD (copying errors): "humans have been devolving and learning from the past experience"
+✅ GOOD (fixed): "Humans have been evolving and learning from past experiences"
+
+❌ BAD: "machine learning is the code of many famous injectors built in Spanish"
+✅ GOOD: "Machine learning is a core technology used in many famous applications"
+
+❌ BAD: "machines are devolving by a living need to be programmed"
+✅ GOOD: "Machines are evolving beyond the need to be explicitly programmed"
+
+Your task:
+1. READ the messy transcription and UNDERSTAND the actual topic
+2. IDENTIFY what concepts the speaker is trying to explain
+3. USE the document context to get correct information
+4. WRITE clear, accurate notes using proper terminology
+5. ORGANIZE information logically with headers and bullets
+6. EXPLAIN concepts properly - don't just list broken sentences
+
+Output format:
+- Use ## for main topics (e.g., ## Introduction to Machine Learning)
+- Use ### for subtopics (e.g., ### Types of Learning)
+- Use bullet points for key information
+- Use **bold** for important technical terms
+- Write in complete, correct sentences
+- Make it educational and easy to understand"""
+
+USER_PROMPT_PREFIX = """The transcription below is FULL OF ERRORS. Your job is to understand what was actually meant and create accurate notes.
+
+STEP-BY-STEP INSTRUCTIONS:
+1. READ the transcription carefully - it has many errors
+2. FIGURE OUT what topic the speaker is actually discussing (AI? Machine Learning? Neural Networks?)
+3. LOOK at the course documents to understand the correct concepts
+4. WRITE accurate, clear notes that explain what was MEANT (not what was said)
+5. FIX all grammar errors, wrong words, and nonsense phrases
+6. USE proper technical terminology from the documents
+7. ORGANIZE with clear headers (##, ###) and bullet points
+
+CRITICAL: Do NOT copy the transcription errors! Understand the meaning and write correct notes.
+
+Example transformation:
+Messy: "humans have been devolving and learning from the past experience since many years"
+Fixed: "Humans have been evolving and learning from past experiences over many years"
+
+Messy: "machine learning is the code of many famous injectors built in Spanish"  
+Fixed: "Machine learning is a core technology used in many famous applications"
+
+Now create accurate, educational notes from the material below."""
+
+# Per-field prompt budgets (tokens) keep prefill cost bounded as a lecture grows
+TRANSCRIPTION_TOKEN_BUDGET = 2000  # keeps the most recent speech
+CONTEXT_TOKEN_BUDGET = 1500  # keeps the highest-ranked RAG chunks
+PREVIOUS_NOTES_TOKEN_BUDGET = 500  # keeps the latest notes
+CHARS_PER_TOKEN = 4  # estimate used when no tokenizer is configured
+
+# Prompt tokenizer (lazy loaded; False once loading has failed)
+_tokenizer = None
+
+# Synthesis cache: exact hits by input hash, fuzzy hits by embedding similarity
+# (semantic entries keep one window-embedding matrix per input field)
+_exact_cache: "OrderedDict[str, str]" = OrderedDict()
+_semantic_cache: Deque[Tuple[List[np.ndarray], str]] = deque(maxlen=settings.SYNTHESIS_CACHE_SIZE)
 
 
 async def synthesize_structured_notes(
     transcriptions: List[Dict[str, Any]],
     rag_context: List[str],
     lecture_id: str,
-    previous_structured_notes: Optional[str] = None
+    previous_structured_notes: Optional[str] = None,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None
 ) -> Dict[str, Any]:
     """
     Synthesize multiple transcription chunks into structured, coherent notes.
@@ -32,6 +133,9 @@ async def synthesize_structured_notes(
         rag_context: Relevant document chunks from FAISS
         lecture_id: Current lecture ID
         previous_structured_notes: Previously generated structured notes
+        on_delta: Awaited with each text delta while Groq streams the notes.
+            Deltas are provisional: if the stream fails part-way the returned
+            notes are the fallback synthesis ("fallback": True), not the partial text.
     
     Returns:
         Dict with structured notes and metadata
@@ -45,78 +149,206 @@ async def synthesize_structured_notes(
             "error": "No transcription content to synthesize"
         }
     
-    # Run synthesis in executor to avoid blocking
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        None,
-        _synthesize_sync,
+    result, fallback = await _synthesize(
         full_transcription,
         rag_context,
-        previous_structured_notes
+        previous_structured_notes,
+        on_delta
     )
     
     return {
         "success": True,
         "structured_notes": result,
+        "fallback": fallback,
         "transcription_count": len(transcriptions),
         "lecture_id": lecture_id
     }
 
 
-def _synthesize_sync(
+async def _synthesize(
     full_transcription: str,
     rag_context: List[str],
-    previous_notes: Optional[str]
-) -> str:
-    """Synchronous synthesis function."""
+    previous_notes: Optional[str],
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Tuple[str, bool]:
+    """Run one synthesis job under the Groq concurrency limit; returns (notes, whether they are the fallback)."""
     
-    if not groq_client:
+    if not async_groq_client:
         print("⚠️  WARNING: GROQ client not available! Using fallback (will copy transcription errors)")
         print("⚠️  Please set GROQ_API_KEY in .env file!")
-        return _fallback_synthesis(full_transcription)
+        return _fallback_synthesis(full_transcription), True
     
-    # Build context
-    context_text = "\n\n".join(rag_context[:5]) if rag_context else "No additional context available."
-    previous_text = previous_notes if previous_notes else "This is the first set of notes for this lecture."
+    # Check cache before paying for a Groq call
+    cache_key, cache_embedding, cached = await _lookup_cache(
+        full_transcription, rag_context, previous_notes
+    )
+    if cached is not None:
+        return cached, False
+    
+    system_prompt, user_prompt = _build_prompts(full_transcription, rag_context, previous_notes)
     
-    # System prompt for agentic synthesis with deep knowledge integration
-    system_prompt = """You are an expert educational note-taker who MUST fix transcription errors and create accurate, educational notes.
+    try:
+        async with _get_groq_semaphore():
+            # Bounds the whole stream, so a stalled one can't hold its slot
+            result = await asyncio.wait_for(
+                _synthesize_async(settings.LLM_MODEL, system_prompt, user_prompt, on_delta),
+                timeout=settings.GROQ_TIMEOUT_SECONDS
+            )
+    except Exception as e:
+        # Any streamed deltas are discarded; partial notes are never returned
+        print(f"❌ Error in agentic synthesis: {e}")
+        print(f"⚠️  Falling back to simple synthesis (will have errors!)")
+        return _fallback_synthesis(full_transcription), True
+    
+    _store_in_cache(cache_key, cache_embedding, result)
+    return result, False
 
-CRITICAL RULES:
-1. The transcription is FULL OF ERRORS from speech recognition (wrong words, grammar mistakes, nonsense phrases)
-2. Your job is to UNDERSTAND what the speaker ACTUALLY meant and write CORRECT notes
-3. DO NOT copy the transcription errors - FIX THEM!
-4. Use the document context to understand correct terminology and concepts
-5. Write clear, accurate, educational notes that make sense
 
-EXAMPLE OF WHAT YOU MUST DO:
-❌ BAD (copying errors): "humans have been devolving and learning from the past experience"
-✅ GOOD (fixed): "Humans have been evolving and learning from past experiences"
+async def _lookup_cache(
+    full_transcription: str,
+    rag_context: List[str],
+    previous_notes: Optional[str]
+) -> Tuple[str, Optional[List[np.ndarray]], Optional[str]]:
+    """Return (cache key, input embeddings, cached notes or None)."""
+    cache_key = _cache_key(full_transcription, rag_context, previous_notes)
+    cached = _exact_cache.get(cache_key)
+    if cached is not None:
+        _exact_cache.move_to_end(cache_key)
+        print("⚡ Synthesis cache hit (exact)")
+        return cache_key, None, cached
+    
+    cache_embedding = await _embed_for_cache(full_transcription, rag_context, previous_notes)
+    cached = _lookup_semantic_cache(cache_embedding)
+    if cached is not None:
+        print("⚡ Synthesis cache hit (semantic)")
+    return cache_key, cache_embedding, cached
 
-❌ BAD: "machine learning is the code of many famous injectors built in Spanish"
-✅ GOOD: "Machine learning is a core technology used in many famous applications"
 
-❌ BAD: "machines are devolving by a living need to be programmed"
-✅ GOOD: "Machines are evolving beyond the need to be explicitly programmed"
+def _cache_key(
+    full_transcription: str,
+    rag_context: List[str],
+    previous_notes: Optional[str]
+) -> str:
+    """Hash the synthesis inputs for exact cache lookups."""
+    context_text = "\n\n".join(rag_context[:5]) if rag_context else ""
+    raw = "|".join([full_transcription, context_text, previous_notes or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-Your task:
-1. READ the messy transcription and UNDERSTAND the actual topic
-2. IDENTIFY what concepts the speaker is trying to explain
-3. USE the document context to get correct information
-4. WRITE clear, accurate notes using proper terminology
-5. ORGANIZE information logically with headers and bullets
-6. EXPLAIN concepts properly - don't just list broken sentences
 
-Output format:
-- Use ## for main topics (e.g., ## Introduction to Machine Learning)
-- Use ### for subtopics (e.g., ### Types of Learning)
-- Use bullet points for key information
-- Use **bold** for important technical terms
-- Write in complete, correct sentences
-- Make it educational and easy to understand"""
+async def _embed_for_cache(
+    full_transcription: str,
+    rag_context: List[str],
+    previous_notes: Optional[str]
+) -> Optional[List[np.ndarray]]:
+    """
+    Embed the synthesis inputs (unit length) for semantic cache lookups.
+    
+    Each field is embedded on its own in WINDOW_CHARS windows, since the embedder
+    truncates long input; returns one (windows, dim) matrix per field.
+    """
+    try:
+        from app.services.document_processor_mongodb import get_embedder
+        
+        fields = [full_transcription, "\n\n".join(rag_context[:5]) if rag_context else "", previous_notes or ""]
+        windows = [
+            [field[i:i + WINDOW_CHARS] for i in range(0, len(field), WINDOW_CHARS)] or [""]
+            for field in fields
+        ]
+        embedder = get_embedder()
+        embeddings = await asyncio.to_thread(
+            embedder.encode, [w for field_windows in windows for w in field_windows],
+            show_progress_bar=False, normalize_embeddings=True
+        )
+        rows = np.asarray(embeddings, dtype=np.float32)
+        return np.split(rows, np.cumsum([len(w) for w in windows])[:-1])
+    except Exception as e:
+        print(f"⚠️  Semantic cache embedding failed: {e}")
+        return None
 
-    # User prompt with enhanced instructions
-    user_prompt = f"""The transcription below is FULL OF ERRORS. Your job is to understand what was actually meant and create accurate notes.
+
+def _lookup_semantic_cache(embedding: Optional[List[np.ndarray]]) -> Optional[str]:
+    """Return the newest cached notes whose every input window is nearly identical to these."""
+    if embedding is None:
+        return None
+    
+    threshold = settings.SYNTHESIS_CACHE_SIMILARITY
+    for cached_embedding, notes in reversed(_semantic_cache):
+        if all(
+            cached.shape == field.shape and np.all(np.einsum("ij,ij->i", cached, field) >= threshold)
+            for cached, field in zip(cached_embedding, embedding)
+        ):
+            return notes
+    return None
+
+
+def _store_in_cache(cache_key: str, embedding: Optional[List[np.ndarray]], notes: str) -> None:
+    """Remember synthesized notes for both exact and semantic lookups."""
+    _exact_cache[cache_key] = notes
+    _exact_cache.move_to_end(cache_key)
+    while len(_exact_cache) > settings.SYNTHESIS_CACHE_SIZE:
+        _exact_cache.popitem(last=False)
+    
+    if embedding is not None:
+        _semantic_cache.append((embedding, notes))
+
+
+def _get_groq_semaphore() -> asyncio.Semaphore:
+    """Get or create the semaphore bounding concurrent Groq calls."""
+    global _groq_semaphore
+    if _groq_semaphore is None:
+        _groq_semaphore = asyncio.Semaphore(settings.GROQ_MAX_CONCURRENCY)
+    return _groq_semaphore
+
+
+def _get_tokenizer():
+    """Get or create the tokenizer named by LLM_TOKENIZER (None if unavailable)."""
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = False
+        if TOKENIZER_AVAILABLE and settings.LLM_TOKENIZER:
+            try:
+                _tokenizer = AutoTokenizer.from_pretrained(settings.LLM_TOKENIZER)
+            except Exception as e:
+                print(f"⚠️  Could not load tokenizer {settings.LLM_TOKENIZER}, estimating tokens: {e}")
+    return _tokenizer or None
+
+
+def _truncate(text: str, max_tokens: int, keep_tail: bool = False) -> str:
+    """Trim text to max_tokens, keeping its head (or its tail when keep_tail)."""
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        return text[-max_chars:] if keep_tail else text[:max_chars]
+    
+    tokens = tokenizer.encode(text, add_special_tokens=False)
+    if len(tokens) <= max_tokens:
+        return text
+    tokens = tokens[-max_tokens:] if keep_tail else tokens[:max_tokens]
+    return tokenizer.decode(tokens)
+
+
+def _build_prompts(
+    full_transcription: str,
+    rag_context: List[str],
+    previous_notes: Optional[str]
+) -> Tuple[str, str]:
+    """Build the system and user prompts for a synthesis call."""
+    
+    # Build context, each field trimmed to its token budget
+    full_transcription = _truncate(full_transcription, TRANSCRIPTION_TOKEN_BUDGET, keep_tail=True)
+    context_text = (
+        _truncate("\n\n".join(rag_context[:5]), CONTEXT_TOKEN_BUDGET)
+        if rag_context else "No additional context available."
+    )
+    previous_text = (
+        _truncate(previous_notes, PREVIOUS_NOTES_TOKEN_BUDGET, keep_tail=True)
+        if previous_notes else "This is the first set of notes for this lecture."
+    )
+    
+    # Static instructions first, variable content last (keeps the prefix cacheable)
+    user_prompt = f"""{USER_PROMPT_PREFIX}
 
 MESSY TRANSCRIPTION (fix all errors!):
 \"\"\"
@@ -132,47 +364,41 @@ PREVIOUS NOTES (for context, don't repeat):
 \"\"\"
 {previous_text}
 \"\"\"
+"""
 
-STEP-BY-STEP INSTRUCTIONS:
-1. READ the transcription carefully - it has many errors
-2. FIGURE OUT what topic the speaker is actually discussing (AI? Machine Learning? Neural Networks?)
-3. LOOK at the course documents to understand the correct concepts
-4. WRITE accurate, clear notes that explain what was MEANT (not what was said)
-5. FIX all grammar errors, wrong words, and nonsense phrases
-6. USE proper technical terminology from the documents
-7. ORGANIZE with clear headers (##, ###) and bullet points
-
-CRITICAL: Do NOT copy the transcription errors! Understand the meaning and write correct notes.
-
-Example transformation:
-Messy: "humans have been devolving and learning from the past experience since many years"
-Fixed: "Humans have been evolving and learning from past experiences over many years"
-
-Messy: "machine learning is the code of many famous injectors built in Spanish"  
-Fixed: "Machine learning is a core technology used in many famous applications"
+    return SYSTEM_PROMPT, user_prompt
 
-Now create accurate, educational notes:"""
 
-    try:
-        print(f"🤖 Calling GROQ API for synthesis...")
-        response = groq_client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.3,  # Higher for better understanding/correction
-            max_tokens=1500,  # More tokens for comprehensive notes
-        )
-        
-        result = response.choices[0].message.content.strip()
-        print(f"✅ GROQ API synthesis successful! Generated {len(result)} characters")
-        return result
-        
-    except Exception as e:
-        print(f"❌ Error in agentic synthesis: {e}")
-        print(f"⚠️  Falling back to simple synthesis (will have errors!)")
-        return _fallback_synthesis(full_transcription)
+async def _synthesize_async(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+) -> str:
+    """Streaming Groq call for a single synthesis job; deltas go to on_delta as they arrive."""
+    print(f"🤖 Calling GROQ API for synthesis...")
+    stream = await async_groq_client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.3,  # Higher for better understanding/correction
+        max_tokens=1500,  # More tokens for comprehensive notes
+        stream=True
+    )
+    
+    parts = []
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content or ""
+        if delta:
+            parts.append(delta)
+            if on_delta is not None:
+                await on_delta(delta)
+    
+    result = "".join(parts).strip()
+    print(f"✅ GROQ API synthesis successful! Generated {len(result)} characters")
+    return result
 
 
 def _fallback_synthesis(transcription: str) -> str:
@@ -191,6 +417,39 @@ def _fallback_synthesis(transcription: str) -> str:
     return notes
 
 
+async def is_near_duplicate(
+    current_transcription: str,
+    previous_transcription: Optional[str]
+) -> bool:
+    """
+    Check whether a transcription window repeats the previously synthesized one.
+    
+    Compares the two windows' speech by embedding cosine; above
+    SYNTHESIS_SKIP_SIMILARITY the Groq call can be skipped. Embeddings come
+    from the query cache that the RAG lookup for each window also uses, so
+    the previous window is never re-embedded.
+    """
+    if not previous_transcription or not current_transcription.strip():
+        return False
+    
+    try:
+        from app.services.document_processor_mongodb import embed_query
+        
+        current, previous = await asyncio.gather(
+            embed_query(current_transcription),
+            embed_query(previous_transcription)
+        )
+    except Exception as e:
+        print(f"⚠️  Near-duplicate check failed: {e}")
+        return False
+    
+    score = float(np.dot(current, previous))
+    if score > settings.SYNTHESIS_SKIP_SIMILARITY:
+        print(f"⏭️  Skipping synthesis: transcription repeats the previous window (similarity {score:.3f})")
+        return True
+    return False
+
+
 async def detect_topic_shift(
     current_transcription: str,
     previous_transcriptions: List[str]
@@ -212,21 +471,5 @@ async def detect_topic_shift(
     if not previous_transcriptions:
         return False
     
-    # Keywords that indicate topic transitions
-    transition_keywords = [
-        "now let's move on",
-        "next topic",
-        "moving on to",
-        "let's discuss",
-        "now we'll talk about",
-        "switching to",
-        "another important topic"
-    ]
-    
-    current_lower = current_transcription.lower()
-    
-    for keyword in transition_keywords:
-        if keyword in current_lower:
-            return True
-    
-    return False
+    # Single pass over the text for all transition keywords
+    return bool(_TOPIC_SHIFT_RE.search(current_transcription))
@@ -9,7 +9,7 @@ import asyncio
 from pathlib import Path
 from typing import List, Dict, Any
 from sentence_transformers import SentenceTransformer
-from PyPDF2 import PdfReader
+from app.services.pdf_extractor import extract_pdf_text
 from pptx import Presentation
 import docx
 
@@ -28,13 +28,7 @@ def get_embedder():
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extract text from PDF file."""
     try:
-        reader = PdfReader(pdf_path)
-        text = []
-        for page in reader.pages:
-            content = page.extract_text()
-            if content:
-                text.append(content)
-        return "\n".join(text)
+        return extract_pdf_text(pdf_path)
     except Exception as e:
         print(f"Error extracting PDF {pdf_path}: {e}")
         return ""
@@ -4,43 +4,194 @@ Replaces FAISS with MongoDB Atlas Vector Search
 """
 import os
 import asyncio
+import hashlib
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from sentence_transformers import SentenceTransformer
-from PyPDF2 import PdfReader
+from app.services.pdf_extractor import extract_pdf_text, iter_pdf_text
+from app.services.onnx_embedder import OnnxEmbedder, ORT_AVAILABLE
 from pptx import Presentation
 import docx
 import numpy as np
+import torch
 
 from app.core.config import settings
 from database.mongodb_connection import (
     save_document,
+    set_document_content,
+    delete_document,
     save_document_embeddings,
+    get_cached_embeddings,
+    cache_embeddings,
     vector_search,
     simple_vector_search,
     mark_document_processed
 )
 
+# Cap intra-op threads for CPU inference (more threads mostly add contention)
+torch.set_num_threads(min(8, os.cpu_count() or 1))
+
 # Global embedder (lazy loaded)
 _embedder = None
 
+# Every code point str.isspace() accepts (all are <= U+3000), i.e. what regex \s matches
+_WHITESPACE = np.array([c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32)
+
+# Ingest pipeline tuning: bounded queues between stages, chunks per embed call
+PIPELINE_QUEUE_SIZE = 4
+PIPELINE_EMBED_BATCH = 32
+
+# Recent query embeddings (overlapping transcription windows and retries repeat queries)
+QUERY_CACHE_SIZE = 512
+_query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+def _use_onnx_embedder() -> bool:
+    """True when onnxruntime is installed and the int8 export exists."""
+    return ORT_AVAILABLE and Path(settings.EMBEDDING_ONNX_DIR).exists()
+
 def get_embedder():
-    """Get or create the sentence transformer model."""
+    """Get or create the embedding model (int8 ONNX export if available)."""
     global _embedder
     if _embedder is None:
-        _embedder = SentenceTransformer(settings.EMBEDDING_MODEL)
+        if _use_onnx_embedder():
+            print(f"⚡ Using ONNX Runtime embedder from {settings.EMBEDDING_ONNX_DIR}")
+            _embedder = OnnxEmbedder(settings.EMBEDDING_ONNX_DIR)
+        else:
+            _embedder = SentenceTransformer(settings.EMBEDDING_MODEL)
+            _embedder.eval()  # inference only
+            if torch.cuda.is_available():
+                # FP16 halves memory traffic and runs on tensor cores
+                _embedder = _embedder.half().to('cuda')
+                print("⚡ Embedding model running in FP16 on CUDA")
     return _embedder
 
+def _embedder_tag() -> str:
+    """Names the model and precision get_embedder serves (part of the embedding cache key)."""
+    if _use_onnx_embedder():
+        return f"{settings.EMBEDDING_MODEL}:onnx-int8"
+    if torch.cuda.is_available():
+        return f"{settings.EMBEDDING_MODEL}:fp16"
+    return settings.EMBEDDING_MODEL
+
+def preload_embedder(share_memory: bool = False) -> None:
+    """
+    Load the embedding model before the first request.
+    
+    With share_memory=True (pre-fork parent, see gunicorn.conf.py) the weights are
+    moved to shared memory so every forked worker reuses one copy. CUDA contexts
+    and ONNX Runtime sessions don't survive fork, so those stay per-worker.
+    """
+    if share_memory and (torch.cuda.is_available() or _use_onnx_embedder()):
+        print("⚠️  Skipping pre-fork embedder load (CUDA/ONNX models are per-process)")
+        return
+    
+    model = get_embedder()
+    if share_memory and isinstance(model, SentenceTransformer):
+        torch.multiprocessing.set_sharing_strategy('file_system')
+        model.share_memory()
+        print("✅ Embedding model loaded into shared memory")
+
+def _encode_no_grad(embedder, texts: List[str]) -> np.ndarray:
+    """Normalized numpy embeddings; no autograd state, so threads don't contend on it."""
+    with torch.no_grad():
+        return embedder.encode(
+            texts,
+            batch_size=128,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent encode requests into single SentenceTransformer calls
+    
+    INVARIANT: every embedding returned here is L2-normalized. Stored document
+    embeddings and query embeddings both come from this path, so similarity
+    search can score with a plain dot product (see simple_vector_search).
+    """
+    
+    def __init__(self, window_ms: int, max_batch: int):
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts; returns an (len(texts), dim) array."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(texts), future))
+        return await future
+    
+    async def _run(self) -> None:
+        """Drain pending requests every window and encode them in one pass."""
+        while True:
+            items = [await self._queue.get()]
+            await asyncio.sleep(self.window_ms / 1000)
+            while not self._queue.empty() and len(items) < self.max_batch:
+                items.append(self._queue.get_nowait())
+            
+            all_texts = [text for texts, _ in items for text in texts]
+            try:
+                embedder = get_embedder()
+                # Model forward pass runs in a worker thread, not on the event loop
+                embeddings = await asyncio.to_thread(_encode_no_grad, embedder, all_texts)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            # Split the combined output back per request
+            offset = 0
+            for texts, future in items:
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + len(texts)])
+                offset += len(texts)
+
+_batcher = EmbeddingBatcher(
+    window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+    max_batch=settings.EMBEDDING_MAX_BATCH
+)
+
+async def _embed_chunks(texts: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Embeddings for distinct chunk texts, reusing the embedding_cache collection.
+    
+    Keyed by SHA-256 of the embedder tag plus the text, so a rerun of the same
+    document skips the forward pass and a model change never reuses old
+    vectors. Cache failures only cost a recomputation.
+    """
+    tag = _embedder_tag()
+    keys = {text: hashlib.sha256(f"{tag}\0{text}".encode("utf-8")).digest() for text in texts}
+    try:
+        cached = await get_cached_embeddings(list(keys.values()))
+    except Exception as e:
+        print(f"⚠️  Embedding cache lookup failed: {e}")
+        cached = {}
+    
+    result = {text: cached[key] for text, key in keys.items() if key in cached}
+    missing = [text for text in texts if text not in result]
+    if missing:
+        # Batched with other concurrent requests
+        embeddings = await _batcher.encode(missing)
+        result.update(zip(missing, embeddings))
+        try:
+            await cache_embeddings({keys[text]: embedding for text, embedding in zip(missing, embeddings)}, tag)
+        except Exception as e:
+            print(f"⚠️  Embedding cache write failed: {e}")
+    return result
+
 def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from PDF file."""
+    """Extract text from PDF file (pages split across worker processes)."""
     try:
-        reader = PdfReader(pdf_path)
-        text = []
-        for page in reader.pages:
-            content = page.extract_text()
-            if content:
-                text.append(content)
-        return "\n".join(text)
+        return extract_pdf_text(pdf_path)
     except Exception as e:
         print(f"Error extracting PDF {pdf_path}: {e}")
         return ""
@@ -82,15 +233,50 @@ def extract_text_from_txt(txt_path: str) -> str:
         print(f"Error extracting TXT {txt_path}: {e}")
         return ""
 
+def _word_starts(text: str) -> np.ndarray:
+    """Offsets of each word's first character, found with vectorized whitespace tests."""
+    if not text:
+        return np.empty(0, dtype=np.intp)
+    # UTF-32 gives one uint32 per character, so array offsets are string offsets
+    codepoints = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    is_ws = np.isin(codepoints, _WHITESPACE)
+    prev_ws = np.empty_like(is_ws)
+    prev_ws[0] = True
+    prev_ws[1:] = is_ws[:-1]
+    return np.flatnonzero(~is_ws & prev_ws)
+
 def chunk_text(text: str, chunk_size: int = 300) -> List[str]:
-    """Split text into word chunks."""
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size):
-        chunk = " ".join(words[i:i + chunk_size])
-        if chunk.strip():
-            chunks.append(chunk.strip())
-    return chunks
+    """Split text into word chunks, slicing the original string (whitespace preserved)."""
+    # Each chunk runs from its first word up to the start of the next chunk's first word
+    bounds = _word_starts(text)[::chunk_size].tolist()
+    chunks = [text[start:end].rstrip() for start, end in zip(bounds, bounds[1:] + [len(text)])]
+    return [chunk for chunk in chunks if chunk]
+
+def _split_complete_chunks(text: str, chunk_size: int) -> Tuple[List[str], str]:
+    """
+    Cut the chunks of text that are known to be complete (the next chunk's first
+    word has been seen); return them plus the unfinished tail. Feeding the tail
+    back with more text reproduces chunk_text over the concatenation.
+    """
+    bounds = _word_starts(text)[::chunk_size].tolist()
+    if not bounds:
+        return [], ""
+    chunks = [text[start:end].rstrip() for start, end in zip(bounds, bounds[1:])]
+    return [chunk for chunk in chunks if chunk], text[bounds[-1]:]
+
+def _too_short(text: str) -> bool:
+    """Documents with less text than this are rejected rather than indexed."""
+    return len(text.strip()) < 50
+
+def _iter_text_segments(file_path: str, extractor) -> Iterator[str]:
+    """Yield text incrementally: PDFs page range by page range, other formats whole."""
+    if extractor is extract_text_from_pdf:
+        try:
+            yield from iter_pdf_text(file_path)
+        except Exception as e:
+            print(f"Error extracting PDF {file_path}: {e}")
+        return
+    yield extractor(file_path)
 
 async def process_document(
     file_path: str,
@@ -100,6 +286,11 @@ async def process_document(
     """
     Process a document and store in MongoDB with embeddings.
     
+    Runs as a streaming pipeline (extract -> chunk -> embed -> save) with bounded
+    queues between stages, so embedding and saving start while later pages are
+    still being extracted instead of waiting for the whole file. The document
+    record is inserted first and its body filled in once extraction finishes.
+    
     Args:
         file_path: Path to the document file
         lecture_id: ID of the lecture this document belongs to
@@ -114,16 +305,16 @@ async def process_document(
     file_ext = Path(file_path).suffix.lower()
     
     if file_ext == '.pdf':
-        text = extract_text_from_pdf(file_path)
+        extractor = extract_text_from_pdf
         file_type = 'pdf'
     elif file_ext in ['.ppt', '.pptx']:
-        text = extract_text_from_ppt(file_path)
+        extractor = extract_text_from_ppt
         file_type = 'pptx'
     elif file_ext in ['.doc', '.docx']:
-        text = extract_text_from_docx(file_path)
+        extractor = extract_text_from_docx
         file_type = 'docx'
     elif file_ext == '.txt':
-        text = extract_text_from_txt(file_path)
+        extractor = extract_text_from_txt
         file_type = 'txt'
     else:
         return {
@@ -131,53 +322,106 @@ async def process_document(
             "error": f"Unsupported file type: {file_ext}"
         }
     
-    if not text or len(text.strip()) < 50:
-        return {
-            "success": False,
-            "error": "No text extracted or text too short"
-        }
-    
-    print(f"✅ Extracted {len(text)} characters from {filename}")
-    
-    # Save document metadata to MongoDB
+    # The record exists before extraction so chunks can be saved as soon as they are embedded
     document_id = await save_document(
         lecture_id=lecture_id,
         filename=filename,
         file_type=file_type,
         file_path=file_path,
-        content=text
+        content=""
     )
     
-    print(f"✅ Saved document to MongoDB: {document_id}")
+    segments: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    chunk_batches: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    embedded: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    state = {"text": "", "chunk_count": 0}
     
-    # Chunk the text
-    chunks = chunk_text(text, chunk_size=300)
-    print(f"✅ Created {len(chunks)} chunks")
-    
-    # Generate embeddings
-    embedder = get_embedder()
-    embeddings = embedder.encode(chunks, show_progress_bar=False)
-    print(f"✅ Generated embeddings: {embeddings.shape}")
-    
-    # Prepare data for MongoDB
-    embedding_data = [
-        {
-            'lecture_id': lecture_id,
-            'document_id': document_id,
-            'chunk_text': chunk,
-            'chunk_index': i,
-            'embedding': embedding,
-            'metadata': {
-                'filename': filename,
-                'file_type': file_type
-            }
+    async def extract_stage():
+        # Extraction is CPU-bound; pull each segment in a worker thread
+        loop = asyncio.get_running_loop()
+        iterator = _iter_text_segments(file_path, extractor)
+        pages = []
+        while (segment := await loop.run_in_executor(None, next, iterator, None)) is not None:
+            if segment:
+                pages.append(segment)
+                await segments.put(segment)
+        # Set before the end marker so chunk_stage can reject short documents
+        state["text"] = "\n".join(pages)
+        await segments.put(None)
+    
+    async def chunk_stage():
+        tail = ""
+        pending: List[str] = []
+        while (segment := await segments.get()) is not None:
+            chunks, tail = _split_complete_chunks(f"{tail}\n{segment}" if tail else segment, 300)
+            pending.extend(chunks)
+            while len(pending) >= PIPELINE_EMBED_BATCH:
+                await chunk_batches.put(pending[:PIPELINE_EMBED_BATCH])
+                pending = pending[PIPELINE_EMBED_BATCH:]
+        # Full batches only go out for long texts, so a rejected document is never embedded
+        if not _too_short(state["text"]):
+            pending.extend(chunk_text(tail, chunk_size=300))
+            if pending:
+                await chunk_batches.put(pending)
+        await chunk_batches.put(None)
+    
+    async def embed_stage():
+        # Repeated boilerplate (headers, footers, disclaimers) is embedded once per document
+        known: Dict[str, np.ndarray] = {}
+        while (batch := await chunk_batches.get()) is not None:
+            unique = [chunk for chunk in dict.fromkeys(batch) if chunk not in known]
+            if unique:
+                known.update(await _embed_chunks(unique))
+            await embedded.put((batch, np.stack([known[chunk] for chunk in batch])))
+        await embedded.put(None)
+    
+    async def save_stage():
+        while (item := await embedded.get()) is not None:
+            batch, embeddings = item
+            offset = state["chunk_count"]
+            await save_document_embeddings([
+                {
+                    'lecture_id': lecture_id,
+                    'document_id': document_id,
+                    'chunk_text': chunk,
+                    'chunk_index': offset + i,
+                    'embedding': embedding,
+                    'metadata': {
+                        'filename': filename,
+                        'file_type': file_type
+                    }
+                }
+                for i, (chunk, embedding) in enumerate(zip(batch, embeddings))
+            ])
+            state["chunk_count"] += len(batch)
+    
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(extract_stage())
+            tg.create_task(chunk_stage())
+            tg.create_task(embed_stage())
+            tg.create_task(save_stage())
+    except ExceptionGroup as eg:
+        try:
+            await delete_document(document_id, lecture_id)
+        except Exception as e:
+            print(f"⚠️  Could not remove partial document {document_id}: {e}")
+        # Surface the first stage failure like the sequential version did
+        raise eg.exceptions[0]
+    
+    text = state["text"]
+    if _too_short(text):
+        await delete_document(document_id, lecture_id)
+        return {
+            "success": False,
+            "error": "No text extracted or text too short"
         }
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
-    ]
     
-    # Save embeddings to MongoDB
-    await save_document_embeddings(embedding_data)
-    print(f"✅ Saved {len(chunks)} embeddings to MongoDB")
+    print(f"✅ Extracted {len(text)} characters from {filename}")
+    await set_document_content(document_id, lecture_id, filename, text)
+    print(f"✅ Saved document to MongoDB: {document_id}")
+    
+    print(f"✅ Saved {state['chunk_count']} embeddings to MongoDB")
     
     # Mark document as processed
     await mark_document_processed(document_id)
@@ -185,10 +429,25 @@ async def process_document(
     return {
         "success": True,
         "document_id": document_id,
-        "chunk_count": len(chunks),
-        "text_length": len(text)
+        "chunk_count": state["chunk_count"],
+        "text_length": len(state["text"])
     }
 
+async def embed_query(text: str) -> np.ndarray:
+    """Normalized query embedding, served from an LRU on repeats (read-only array)."""
+    embedding = _query_cache.get(text)
+    if embedding is not None:
+        _query_cache.move_to_end(text)
+        return embedding
+    
+    # Generate query embedding (batched with other concurrent requests)
+    embedding = (await _batcher.encode([text]))[0].copy()  # don't pin the whole batch array
+    embedding.setflags(write=False)  # shared between callers
+    _query_cache[text] = embedding
+    if len(_query_cache) > QUERY_CACHE_SIZE:
+        _query_cache.popitem(last=False)
+    return embedding
+
 async def query_documents(
     query_text: str,
     lecture_id: str,
@@ -207,9 +466,7 @@ async def query_documents(
     Returns:
         List of relevant text chunks
     """
-    # Generate query embedding
-    embedder = get_embedder()
-    query_embedding = embedder.encode(query_text, show_progress_bar=False)
+    query_embedding = await embed_query(query_text)
     
     # Try Atlas Vector Search first
     if use_atlas_search:
@@ -220,7 +477,9 @@ async def query_documents(
                 top_k=top_k
             )
             print(f"✅ Atlas Vector Search returned {len(results)} results")
-            return [r['chunk_text'] for r in results]
+            # Quantized (binary) embeddings aren't indexed by Atlas; fall back if empty
+            if results:
+                return [r['chunk_text'] for r in results]
         except Exception as e:
             print(f"⚠️  Atlas Vector Search failed, using fallback: {e}")
     
@@ -10,19 +10,23 @@ comprehensive, humanized final notes with:
 - Further reading from documents
 """
 
+import asyncio
+import hashlib
+import io
 import json
 import re
-import textwrap
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from collections import Counter
 import os
+import numpy as np
 
 # Import from existing services
 from app.core.config import settings
+from app.services.semantic_prompt_cache import SemanticPromptCache
 
 # Try to import Groq
 try:
-    from groq import Groq
+    from groq import AsyncGroq
     GROQ_AVAILABLE = True
 except Exception:
     GROQ_AVAILABLE = False
@@ -34,12 +38,64 @@ try:
 except Exception:
     FAISS_AVAILABLE = False
 
-# Try to import SentenceTransformer
+# Try to import datasketch (near-duplicate note filtering; exact dedup without it)
 try:
-    from sentence_transformers import SentenceTransformer
-    ST_AVAILABLE = True
+    from datasketch import MinHash, MinHashLSH
+    DATASKETCH_AVAILABLE = True
 except Exception:
-    ST_AVAILABLE = False
+    DATASKETCH_AVAILABLE = False
+
+# Patterns used on every synthesis (compiled once)
+_HEADING_RE = re.compile(r'^##\s+(.+)$', re.MULTILINE)
+_DISPLAY_MATH_RE = re.compile(r'\$\$(.*?)\$\$', re.DOTALL)
+_INLINE_MATH_RE = re.compile(r'\\\((.*?)\\\)', re.DOTALL)
+_BOLD_TERM_RE = re.compile(r'\*\*([A-Z][a-zA-Z\s]{2,20})\*\*')
+_BULLET_RE = re.compile(r'^[-•]\s*(.+)$', re.MULTILINE)
+_SLUG_RE = re.compile(r'[^a-z0-9]+')
+_DASH_RUN_RE = re.compile(r'--+')
+_WHITESPACE_RE = re.compile(r'\s+')
+# ASCII fast path for _slugify: everything except a-z, 0-9 becomes '-'
+_SLUG_TABLE = str.maketrans({
+    c: '-' for c in map(chr, range(128))
+    if not ('a' <= c <= 'z' or '0' <= c <= '9')
+})
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Called with each finished section (title, content, formulas, index) as soon as it's ready
+SectionCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Fused single-call synthesis: notes sent and output budget (4 sections + glossary + takeaways)
+FUSED_NOTES_CHARS = 6000
+FUSED_MAX_TOKENS = 2000
+
+# Near-duplicate note filter (datasketch MinHash LSH)
+NOTE_DEDUP_JACCARD = 0.9
+NOTE_DEDUP_PERMS = 128
+
+# Note chunks retrieved per section for semantic section assignment
+SECTION_TOP_K = 3
+
+# Max sections enhanced at once within a single synthesis
+MAX_CONCURRENT_SECTIONS = 4
+
+# Max in-flight Groq calls across all final syntheses (rate limit guard)
+MAX_CONCURRENT_GROQ_CALLS = 8
+_groq_semaphore: Optional[asyncio.Semaphore] = None
+
+# Near-duplicate prompts (same topic across lectures) reuse earlier responses;
+# one cache file per model so switching LLM_MODEL invalidates it
+prompt_cache = SemanticPromptCache(
+    path=os.path.join(settings.PROMPT_CACHE_DIR, f"{settings.LLM_MODEL.replace('/', '_')}.pkl"),
+    threshold=settings.PROMPT_CACHE_SIMILARITY,
+    ttl=settings.PROMPT_CACHE_TTL_SECONDS
+)
+
+def _get_groq_semaphore() -> asyncio.Semaphore:
+    """Get or create the shared Groq concurrency limit."""
+    global _groq_semaphore
+    if _groq_semaphore is None:
+        _groq_semaphore = asyncio.Semaphore(MAX_CONCURRENT_GROQ_CALLS)
+    return _groq_semaphore
 
 
 class FinalSynthesizer:
@@ -51,14 +107,15 @@ class FinalSynthesizer:
         
         if GROQ_AVAILABLE and settings.GROQ_API_KEY:
             try:
-                self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
+                self.groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY)
             except Exception as e:
                 print(f"Failed to initialize Groq: {e}")
     
-    def synthesize(
+    async def synthesize(
         self,
         structured_notes_list: List[str],
-        rag_context: Optional[List[str]] = None
+        rag_context: Optional[List[str]] = None,
+        on_section: Optional[SectionCallback] = None
     ) -> Dict[str, Any]:
         """
         Synthesize final comprehensive notes
@@ -66,6 +123,7 @@ class FinalSynthesizer:
         Args:
             structured_notes_list: List of structured note strings (markdown)
             rag_context: Optional document context from FAISS
+            on_section: Optional async callback run as each section finishes
             
         Returns:
             Dict with final notes, glossary, takeaways, etc.
@@ -73,24 +131,39 @@ class FinalSynthesizer:
         if not structured_notes_list:
             return self._empty_result()
         
-        # Combine all structured notes
-        combined_notes = "\n\n---\n\n".join(structured_notes_list)
-        
-        # Build outline
-        outline = self._build_outline(combined_notes)
-        
-        # Extract sections
-        sections = self._extract_sections(combined_notes, outline, rag_context)
-        
-        # Build glossary
-        glossary = self._build_glossary(combined_notes, rag_context)
-        
-        # Extract key takeaways
-        takeaways = self._extract_takeaways(sections)
+        # Drop repeated notes so they aren't sent to Groq again
+        structured_notes_list = self._dedup_notes(structured_notes_list)
+        
+        # Combined text for the outline/glossary/fused prompts; sections use the list itself
+        combined_notes = "\n\n".join(structured_notes_list)
+        
+        # One fused Groq call for everything; the multi-call pipeline is the fallback
+        fused = await self._synthesize_all(combined_notes, rag_context)
+        if fused:
+            title = fused["title"]
+            sections = fused["sections"]
+            glossary = fused["glossary"]
+            takeaways = fused["takeaways"]
+            if on_section:
+                for i, section in enumerate(sections):
+                    await on_section({**section, "index": i})
+        else:
+            # Build outline (section names are needed before anything else)
+            outline = await self._build_outline(combined_notes)
+            title = outline["title"]
+            
+            # Section enhancement and glossary are independent; run them concurrently
+            sections, glossary = await asyncio.gather(
+                self._extract_sections(structured_notes_list, outline, rag_context, on_section),
+                self._build_glossary(combined_notes, rag_context)
+            )
+            
+            # Extract key takeaways (depends on the enhanced sections)
+            takeaways = await self._extract_takeaways(sections)
         
         # Generate final markdown
         final_markdown = self._assemble_markdown(
-            outline["title"],
+            title,
             sections,
             glossary,
             takeaways
@@ -98,7 +171,7 @@ class FinalSynthesizer:
         
         return {
             "success": True,
-            "title": outline["title"],
+            "title": title,
             "markdown": final_markdown,
             "sections": sections,
             "glossary": glossary,
@@ -106,14 +179,114 @@ class FinalSynthesizer:
             "lecture_id": self.lecture_id
         }
     
-    def _build_outline(self, combined_notes: str) -> Dict[str, Any]:
+    async def _complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False,
+        exact_cache: bool = False
+    ) -> str:
+        """Run one Groq chat completion (semantic cache first, shared concurrency limit)"""
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+        
+        async def compute() -> str:
+            async with _get_groq_semaphore():
+                response = await self.groq_client.chat.completions.create(
+                    model=settings.LLM_MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **extra
+                )
+            return response.choices[0].message.content.strip()
+        
+        return await prompt_cache.get_or_compute(system_prompt, user_prompt, compute, exact=exact_cache)
+    
+    async def _synthesize_all(
+        self,
+        combined_notes: str,
+        rag_context: Optional[List[str]]
+    ) -> Optional[Dict[str, Any]]:
+        """Outline, sections, glossary and takeaways from ONE JSON-mode Groq call (None on failure)"""
+        
+        if not self.groq_client:
+            return None
+        
+        context_text = "\n\n".join(rag_context[:5]) if rag_context else "No document context"
+        # Candidate glossary terms, same selection as _build_glossary
+        terms = [term for term, _ in Counter(_BOLD_TERM_RE.findall(combined_notes)).most_common(6)]
+        
+        system_prompt = """You are an expert at turning messy lecture notes into CONCISE, STRUCTURED final notes.
+Respond with ONE JSON object only. NO repetition, NO fluff."""
+
+        user_prompt = f"""LECTURE NOTES (accumulated during the lecture, may repeat):
+{combined_notes[:FUSED_NOTES_CHARS]}
+
+DOCUMENT CONTENT (PDF/PPT - USE THIS HEAVILY):
+{context_text[:2000]}
+
+GLOSSARY TERMS:
+{json.dumps(terms)}
+
+Produce:
+1. "title": ONE concise title (4-6 words, topic-focused)
+2. "sections": 2-4 main sections (merge similar topics, NO duplicates, NO "Lecture Notes"); each with
+   "content" in bullet points using BOTH notes and documents (50/50 mix):
+   - Each bullet 10-20 words, max 8-10 bullets
+   - Definitions and formulas from documents, formulas in $$LaTeX$$
+3. "glossary": one-sentence definition (max 20 words) for each glossary term, from the documents
+4. "takeaways": 4 key takeaways, 12-18 words each, actionable/memorable
+
+Return ONLY JSON:
+{{"title": "Topic Name", "sections": [{{"title": "Section 1", "content": "- Point 1\\n- Point 2"}}], "glossary": {{"Term": "Definition"}}, "takeaways": ["Point 1", "Point 2"]}}"""
+
+        try:
+            result = await self._complete(
+                system_prompt,
+                user_prompt,
+                temperature=0.2,
+                max_tokens=FUSED_MAX_TOKENS,
+                json_mode=True,
+                exact_cache=True  # the whole final notes; never reuse them for different input
+            )
+            data = json.loads(self._strip_code_fences(result))
+            
+            sections = [
+                {
+                    "title": str(sec["title"]).strip(),
+                    "content": str(sec["content"]).strip(),
+                    "formulas": self._extract_formulas(str(sec["content"]))
+                }
+                for sec in data["sections"][:4]
+            ]
+            if not data.get("title") or not sections:
+                raise ValueError("missing title or sections")
+            
+            glossary = data.get("glossary") or {}
+            takeaways = data.get("takeaways") or []
+            return {
+                "title": str(data["title"]).strip(),
+                "sections": sections,
+                "glossary": glossary if isinstance(glossary, dict) else {},
+                "takeaways": takeaways[:4] if isinstance(takeaways, list) else []
+            }
+        except Exception as e:
+            print(f"Fused synthesis failed, using multi-call pipeline: {e}")
+            return None
+    
+    async def _build_outline(self, combined_notes: str) -> Dict[str, Any]:
         """Build clean outline from messy structured notes"""
         
         if not self.groq_client:
             return {"title": "Lecture Notes", "sections": ["Introduction", "Main Content"]}
         
         # Extract headings from markdown
-        headings = re.findall(r'^##\s+(.+)$', combined_notes, re.MULTILINE)
+        headings = _HEADING_RE.findall(combined_notes)
         # Remove duplicates while preserving order
         seen = set()
         unique_headings = []
@@ -141,17 +314,12 @@ Example:
 {{"title": "Machine Learning Fundamentals", "sections": ["Core Concepts", "Learning Types", "Neural Networks"]}}"""
 
         try:
-            response = self.groq_client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+            result = await self._complete(
+                system_prompt,
+                user_prompt,
                 temperature=0.15,
                 max_tokens=150
             )
-            
-            result = response.choices[0].message.content.strip()
             result = self._strip_code_fences(result)
             outline = json.loads(result)
             
@@ -168,52 +336,108 @@ Example:
             "sections": unique_headings[1:4] if len(unique_headings) > 1 else ["Main Content"]
         }
     
-    def _extract_sections(
+    async def _extract_sections(
         self,
-        combined_notes: str,
+        note_chunks: List[str],
         outline: Dict[str, Any],
-        rag_context: Optional[List[str]]
+        rag_context: Optional[List[str]],
+        on_section: Optional[SectionCallback] = None
     ) -> List[Dict[str, Any]]:
         """Extract and enhance sections with RAG context"""
         
-        sections = []
         section_names = outline.get("sections", ["Main Content"])
         
-        # Split combined notes into chunks
-        note_chunks = combined_notes.split("---")
+        # Each structured note is one chunk
+        section_contents = await self._assign_section_content(section_names, note_chunks)
         
-        for section_name in section_names:
-            # Find relevant content for this section
-            relevant_content = self._find_relevant_content(section_name, note_chunks)
-            
-            # Enhance with RAG if available
-            enhanced_text = self._enhance_section(
-                section_name,
-                relevant_content,
-                rag_context
-            )
-            
-            # Extract formulas
-            formulas = self._extract_formulas(enhanced_text)
-            
-            sections.append({
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SECTIONS)
+        
+        async def enhance(index: int, section_name: str) -> Dict[str, Any]:
+            async with semaphore:
+                enhanced_text = await self._enhance_section(
+                    section_name,
+                    section_contents[index],
+                    rag_context
+                )
+            section = {
                 "title": section_name,
                 "content": enhanced_text,
-                "formulas": formulas
-            })
+                "formulas": self._extract_formulas(enhanced_text)
+            }
+            if on_section:
+                # Let the caller emit this section before the slower ones finish
+                await on_section({**section, "index": index})
+            return section
+        
+        # Enhance sections concurrently (results keep outline order)
+        return list(await asyncio.gather(*[
+            enhance(i, section_name) for i, section_name in enumerate(section_names)
+        ]))
+    
+    async def _assign_section_content(
+        self,
+        section_names: List[str],
+        note_chunks: List[str]
+    ) -> List[str]:
+        """Relevant note content per section: semantic top-k, keyword match as fallback"""
+        if FAISS_AVAILABLE:
+            try:
+                return await self._retrieve_semantic(section_names, note_chunks)
+            except Exception as e:
+                print(f"Semantic section retrieval failed, using keywords: {e}")
         
-        return sections
+        chunk_index = self._build_chunk_index(note_chunks)
+        return [
+            self._find_relevant_content(section_name, note_chunks, chunk_index)
+            for section_name in section_names
+        ]
+    
+    async def _retrieve_semantic(self, section_names: List[str], note_chunks: List[str]) -> List[str]:
+        """Top-k note chunks per section by cosine similarity (FAISS inner product)"""
+        from app.services.document_processor_mongodb import get_embedder
+        
+        embedder = get_embedder()
+        
+        def encode(texts: List[str]):
+            return np.asarray(embedder.encode(
+                texts,
+                batch_size=64,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ), dtype=np.float32)
+        
+        # One encode call for both sets; sentence-transformers length-sorts each batch
+        embeddings = await asyncio.to_thread(encode, note_chunks + section_names)
+        chunk_embeddings = embeddings[:len(note_chunks)]
+        section_embeddings = embeddings[len(note_chunks):]
+        
+        index = faiss.IndexFlatIP(chunk_embeddings.shape[1])
+        index.add(chunk_embeddings)
+        _, ids = index.search(section_embeddings, min(SECTION_TOP_K, len(note_chunks)))
+        
+        return ["\n\n".join(note_chunks[i] for i in row if i >= 0) for row in ids]
     
-    def _find_relevant_content(self, section_name: str, note_chunks: List[str]) -> str:
+    def _build_chunk_index(self, note_chunks: List[str]) -> Dict[str, List[int]]:
+        """Inverted index: lowercase token -> positions of the chunks containing it"""
+        index: Dict[str, List[int]] = {}
+        for i, chunk in enumerate(note_chunks):
+            for token in set(_TOKEN_RE.findall(chunk.lower())):
+                index.setdefault(token, []).append(i)
+        return index
+    
+    def _find_relevant_content(
+        self,
+        section_name: str,
+        note_chunks: List[str],
+        chunk_index: Dict[str, List[int]]
+    ) -> str:
         """Find content relevant to a section"""
-        # Simple keyword matching
-        keywords = section_name.lower().split()
-        relevant = []
-        
-        for chunk in note_chunks:
-            chunk_lower = chunk.lower()
-            if any(kw in chunk_lower for kw in keywords):
-                relevant.append(chunk)
+        # Keyword matching against the prebuilt index (chunks keep their original order)
+        matches = set()
+        for keyword in set(_TOKEN_RE.findall(section_name.lower())):
+            matches.update(chunk_index.get(keyword, ()))
+        relevant = [note_chunks[i] for i in sorted(matches)]
         
         if not relevant:
             # Take first few chunks as fallback
@@ -221,7 +445,7 @@ Example:
         
         return "\n\n".join(relevant)
     
-    def _enhance_section(
+    async def _enhance_section(
         self,
         section_name: str,
         content: str,
@@ -275,50 +499,32 @@ Output format:
 - Point 3"""
 
         try:
-            response = self.groq_client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+            return await self._complete(
+                system_prompt,
+                user_prompt,
                 temperature=0.2,
                 max_tokens=500  # Shorter output
             )
-            
-            return response.choices[0].message.content.strip()
         except Exception as e:
             print(f"Section enhancement failed: {e}")
             return content[:800]
     
     def _extract_formulas(self, text: str) -> List[str]:
         """Extract LaTeX formulas from text - properly formatted"""
-        formulas = []
-        
-        # Find $$ blocks (display math)
-        display_math = re.findall(r'\$\$(.*?)\$\$', text, re.DOTALL)
-        for f in display_math:
-            f = f.strip()
-            if f and len(f) > 2:  # Avoid empty or tiny formulas
-                formulas.append(f"$$\n{f}\n$$")
-        
-        # Find inline \( \) blocks
-        inline_math = re.findall(r'\\\((.*?)\\\)', text, re.DOTALL)
-        for f in inline_math:
-            f = f.strip()
-            if f and len(f) > 2:
-                formulas.append(f"$$\n{f}\n$$")
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_formulas = []
-        for f in formulas:
-            if f not in seen:
-                seen.add(f)
-                unique_formulas.append(f)
-        
-        return unique_formulas[:5]  # Max 5 formulas per section
+        # Display $$ blocks first, then inline \( \) blocks; dict keeps first-seen order
+        unique_formulas: Dict[str, None] = {}
+        
+        for pattern in (_DISPLAY_MATH_RE, _INLINE_MATH_RE):
+            for match in pattern.finditer(text):
+                f = match.group(1).strip()
+                if len(f) > 2:  # Avoid empty or tiny formulas
+                    unique_formulas.setdefault(f"$$\n{f}\n$$")
+                    if len(unique_formulas) == 5:  # Max 5 formulas per section
+                        return list(unique_formulas)
+        
+        return list(unique_formulas)
     
-    def _build_glossary(
+    async def _build_glossary(
         self,
         combined_notes: str,
         rag_context: Optional[List[str]]
@@ -326,7 +532,7 @@ Output format:
         """Build glossary of key terms - concise definitions from PDF"""
         
         # Extract potential terms (capitalized words, technical terms)
-        terms = re.findall(r'\*\*([A-Z][a-zA-Z\s]{2,20})\*\*', combined_notes)
+        terms = _BOLD_TERM_RE.findall(combined_notes)
         
         # Count frequency
         term_counts = Counter(terms)
@@ -354,17 +560,12 @@ Rules:
 - Focus on key concept only"""
 
         try:
-            response = self.groq_client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+            result = await self._complete(
+                system_prompt,
+                user_prompt,
                 temperature=0.15,
                 max_tokens=250
             )
-            
-            result = response.choices[0].message.content.strip()
             result = self._strip_code_fences(result)
             data = json.loads(result)
             return data.get("definitions", {})
@@ -372,14 +573,14 @@ Rules:
             print(f"Glossary generation failed: {e}")
             return {}
     
-    def _extract_takeaways(self, sections: List[Dict[str, Any]]) -> List[str]:
+    async def _extract_takeaways(self, sections: List[Dict[str, Any]]) -> List[str]:
         """Extract key takeaways - CONCISE, actionable points"""
         
         all_content = "\n\n".join([s["content"] for s in sections])
         
         if not self.groq_client:
             # Simple fallback: extract bullet points
-            bullets = re.findall(r'^[-•]\s*(.+)$', all_content, re.MULTILINE)
+            bullets = _BULLET_RE.findall(all_content)
             return bullets[:4]
         
         system_prompt = "Extract 4 CONCISE key takeaways. Each: 12-18 words max."
@@ -396,17 +597,12 @@ Extract 4 key takeaways:
 Return JSON: {{"takeaways": ["Concise point 1", "Concise point 2", ...]}}"""
 
         try:
-            response = self.groq_client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+            result = await self._complete(
+                system_prompt,
+                user_prompt,
                 temperature=0.15,
                 max_tokens=200
             )
-            
-            result = response.choices[0].message.content.strip()
             result = self._strip_code_fences(result)
             data = json.loads(result)
             return data.get("takeaways", [])[:4]  # Max 4
@@ -414,6 +610,33 @@ Return JSON: {{"takeaways": ["Concise point 1", "Concise point 2", ...]}}"""
             print(f"Takeaways extraction failed: {e}")
             return []
     
+    def _dedup_notes(self, notes: List[str]) -> List[str]:
+        """Drop exact (whitespace/case-normalized) and, with datasketch, near-duplicate notes"""
+        seen = set()
+        unique = []
+        for note in notes:
+            normalized = _WHITESPACE_RE.sub(' ', note.lower()).strip()
+            digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+            if digest not in seen:
+                seen.add(digest)
+                unique.append((note, normalized))
+        
+        if DATASKETCH_AVAILABLE and len(unique) > 1:
+            lsh = MinHashLSH(threshold=NOTE_DEDUP_JACCARD, num_perm=NOTE_DEDUP_PERMS)
+            kept = []
+            for i, (note, normalized) in enumerate(unique):
+                minhash = MinHash(num_perm=NOTE_DEDUP_PERMS)
+                minhash.update_batch([t.encode('utf-8') for t in set(_TOKEN_RE.findall(normalized))])
+                if not lsh.query(minhash):
+                    lsh.insert(str(i), minhash)
+                    kept.append(note)
+        else:
+            kept = [note for note, _ in unique]
+        
+        if len(kept) < len(notes):
+            print(f"🧹 Deduped notes: {len(notes)} → {len(kept)} ({1 - len(kept) / len(notes):.0%} removed)")
+        return kept
+    
     def _assemble_markdown(
         self,
         title: str,
@@ -423,45 +646,38 @@ Return JSON: {{"takeaways": ["Concise point 1", "Concise point 2", ...]}}"""
     ) -> str:
         """Assemble final markdown document"""
         
-        lines = []
+        buf = io.StringIO()
         
-        # Title
-        lines.append(f"# {title}\n")
-        
-        # Table of Contents
-        lines.append("## Table of Contents\n")
-        for i, sec in enumerate(sections, 1):
-            lines.append(f"{i}. [{sec['title']}](#{self._slugify(sec['title'])})")
-        lines.append("")
+        # Title and Table of Contents
+        toc = "".join(
+            f"{i}. [{sec['title']}](#{self._slugify(sec['title'])})\n"
+            for i, sec in enumerate(sections, 1)
+        )
+        buf.write(f"# {title}\n\n## Table of Contents\n\n{toc}\n")
         
         # Sections
         for i, sec in enumerate(sections, 1):
-            lines.append(f"## {i}. {sec['title']}\n")
-            lines.append(sec['content'])
-            lines.append("")
+            buf.write(f"## {i}. {sec['title']}\n\n{sec['content']}\n\n")
             
             # Formulas
             if sec.get('formulas'):
-                lines.append("### Key Formulas\n")
-                for formula in sec['formulas']:
-                    lines.append(f"$$\n{formula}\n$$\n")
-                lines.append("")
+                formulas = "".join(f"$$\n{formula}\n$$\n\n" for formula in sec['formulas'])
+                buf.write(f"### Key Formulas\n\n{formulas}\n")
         
         # Glossary
         if glossary:
-            lines.append("## Glossary\n")
-            for term, definition in sorted(glossary.items()):
-                lines.append(f"**{term}**: {definition}\n")
-            lines.append("")
+            terms = "".join(
+                f"**{term}**: {definition}\n\n" for term, definition in sorted(glossary.items())
+            )
+            buf.write(f"## Glossary\n\n{terms}\n")
         
         # Key Takeaways
         if takeaways:
-            lines.append("## Key Takeaways\n")
-            for takeaway in takeaways:
-                lines.append(f"- {takeaway}")
-            lines.append("")
+            points = "".join(f"- {takeaway}\n" for takeaway in takeaways)
+            buf.write(f"## Key Takeaways\n\n{points}\n")
         
-        return "\n".join(lines)
+        # Every block ends with a blank line; drop the final newline
+        return buf.getvalue()[:-1]
     
     def _strip_code_fences(self, text: str) -> str:
         """Remove markdown code fences"""
@@ -475,7 +691,10 @@ Return JSON: {{"takeaways": ["Concise point 1", "Concise point 2", ...]}}"""
     def _slugify(self, text: str) -> str:
         """Convert text to URL-friendly slug"""
         text = text.lower().strip()
-        text = re.sub(r'[^a-z0-9]+', '-', text)
+        if text.isascii():
+            text = _DASH_RUN_RE.sub('-', text.translate(_SLUG_TABLE))
+        else:
+            text = _SLUG_RE.sub('-', text)
         return text.strip('-')
     
     def _empty_result(self) -> Dict[str, Any]:
@@ -494,30 +713,20 @@ Return JSON: {{"takeaways": ["Concise point 1", "Concise point 2", ...]}}"""
 async def synthesize_final_notes(
     lecture_id: str,
     structured_notes_list: List[str],
-    rag_context: Optional[List[str]] = None
+    rag_context: Optional[List[str]] = None,
+    on_section: Optional[SectionCallback] = None
 ) -> Dict[str, Any]:
     """
-    Async wrapper for final synthesis
+    Run final synthesis (Groq calls are awaited concurrently, no executor)
     
     Args:
         lecture_id: ID of the lecture
         structured_notes_list: List of structured note strings
         rag_context: Optional document context
+        on_section: Optional async callback run as each section finishes
         
     Returns:
         Dict with final notes and metadata
     """
-    import asyncio
-    
     synthesizer = FinalSynthesizer(lecture_id)
-    
-    # Run in executor to avoid blocking
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(
-        None,
-        synthesizer.synthesize,
-        structured_notes_list,
-        rag_context
-    )
-    
-    return result
+    return await synthesizer.synthesize(structured_notes_list, rag_context, on_section)
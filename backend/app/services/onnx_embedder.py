@@ -0,0 +1,73 @@
+"""
+ONNX Runtime sentence embedder for EduScribe
+Drop-in replacement for SentenceTransformer.encode backed by an
+int8-quantized model (see export_onnx_embedder.py;
+install with pip install -r requirements_onnx.txt)
+"""
+from pathlib import Path
+from typing import List, Union
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+    ORT_AVAILABLE = True
+except Exception:
+    ORT_AVAILABLE = False
+
+
+class OnnxEmbedder:
+    """Mean-pooled transformer embeddings computed with ONNX Runtime on CPU"""
+
+    def __init__(self, model_dir: str, max_seq_length: int = 256):
+        model_dir = Path(model_dir)
+        model_file = model_dir / "model_quantized.onnx"
+        if not model_file.exists():
+            model_file = model_dir / "model.onnx"
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            str(model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.max_seq_length = max_seq_length
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """Same call shape as SentenceTransformer.encode (numpy output only)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feed = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+
+            # Mean pooling over real (non-padding) tokens
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+
+        if normalize_embeddings and len(embeddings):
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,81 @@
+"""
+Parallel PDF text extraction for EduScribe (PDFium via pypdfium2)
+Kept free of heavy imports so process-pool workers start quickly
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+import pypdfium2 as pdfium
+
+# PDFs with fewer pages are extracted in-process (pool overhead not worth it)
+PARALLEL_MIN_PAGES = 8
+
+# Shared worker pool (lazy loaded)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# PDFium is not thread-safe, even across documents; all in-process use holds this
+_pdfium_lock = threading.Lock()
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Get or create the PDF extraction process pool.
+    
+    Workers are started with forkserver (spawn where unavailable) rather than
+    fork, so they don't inherit the server's threads or its loaded models.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context(method)
+            )
+    return _pool
+
+def _extract_page_range(args: Tuple[str, int, int]) -> List[str]:
+    """Extract text from pages [start, stop) of a PDF (in a worker process, or under _pdfium_lock)."""
+    pdf_path, start, stop = args
+    pdf = pdfium.PdfDocument(pdf_path)
+    text = []
+    try:
+        for i in range(start, stop):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            content = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            if content:
+                text.append(content)
+    finally:
+        pdf.close()
+    return text
+
+def iter_pdf_text(pdf_path: str) -> Iterator[str]:
+    """Yield PDF text one page range at a time, in page order, as workers finish."""
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_path)
+        num_pages = len(pdf)
+        pdf.close()
+
+    if num_pages < PARALLEL_MIN_PAGES:
+        with _pdfium_lock:
+            text = _extract_page_range((pdf_path, 0, num_pages))
+        yield "\n".join(text)
+        return
+
+    # One contiguous page range per worker so each worker parses the file once
+    workers = min(os.cpu_count() or 1, num_pages)
+    step = -(-num_pages // workers)
+    ranges = [(pdf_path, i, min(i + step, num_pages)) for i in range(0, num_pages, step)]
+
+    for part in get_pool().map(_extract_page_range, ranges):
+        if part:
+            yield "\n".join(part)
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """Extract text from a PDF, splitting pages across worker processes."""
+    return "\n".join(iter_pdf_text(pdf_path))
@@ -0,0 +1,231 @@
+"""
+Semantic prompt cache for EduScribe
+Reuses an earlier LLM response when a new prompt is nearly identical
+(embedding cosine) to one already answered by the same model
+"""
+import asyncio
+import hashlib
+import os
+import pickle
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+
+# Try to import FAISS (numpy dot products are used without it)
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except Exception:
+    FAISS_AVAILABLE = False
+
+# Nearest neighbours checked per lookup (skips expired or mismatched entries)
+SEARCH_K = 8
+
+# Prompts are embedded in windows of this many characters (~256 MiniLM tokens, the
+# model's input limit) so text past the first window still has to match
+WINDOW_CHARS = 1000
+
+# Bumped when the pickle layout changes; older files are ignored
+CACHE_FORMAT_VERSION = 2
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _windows(text: str) -> List[str]:
+    return [text[i:i + WINDOW_CHARS] for i in range(0, len(text), WINDOW_CHARS)] or [""]
+
+
+class _Partition:
+    """
+    Cached responses for prompts sharing one system prompt
+
+    Each entry keeps one embedding per prompt window; heads stacks the first
+    window of every entry for the nearest-neighbour search.
+    """
+
+    def __init__(self, windows: Optional[List[np.ndarray]] = None,
+                 digests: Optional[List[str]] = None,
+                 responses: Optional[List[str]] = None,
+                 created: Optional[List[float]] = None):
+        self.windows = windows or []
+        self.digests = digests or []
+        self.responses = responses or []
+        self.created = created or []
+        self.heads = np.stack([w[0] for w in self.windows]) if self.windows else None
+        self.index = None
+
+    def find_exact(self, digest: str, ttl: float, now: float) -> Optional[str]:
+        """Fresh response for exactly this user prompt, else None."""
+        for i in range(len(self.digests) - 1, -1, -1):
+            if self.digests[i] == digest and now - self.created[i] <= ttl:
+                return self.responses[i]
+        return None
+
+    def search(self, windows: np.ndarray, threshold: float, ttl: float, now: float) -> Optional[str]:
+        """Best fresh response whose every window scores at least threshold, else None."""
+        if not self.responses:
+            return None
+
+        k = min(SEARCH_K, len(self.responses))
+        if FAISS_AVAILABLE:
+            if self.index is None:
+                self.index = faiss.IndexFlatIP(self.heads.shape[1])
+                self.index.add(self.heads)
+            scores, ids = self.index.search(windows[:1], k)
+            candidates = zip(scores[0], ids[0])
+        else:
+            scores = self.heads @ windows[0]
+            ids = np.argsort(-scores)[:k]
+            candidates = zip(scores[ids], ids)
+
+        for score, i in candidates:
+            if i < 0 or score < threshold:
+                break
+            cached = self.windows[i]
+            if now - self.created[i] > ttl or len(cached) != len(windows):
+                continue
+            if np.all(np.einsum("ij,ij->i", cached, windows) >= threshold):
+                return self.responses[i]
+        return None
+
+    def add(self, windows: np.ndarray, digest: str, response: str, now: float, max_entries: int) -> None:
+        head = windows[:1]
+        self.heads = head if self.heads is None else np.vstack([self.heads, head])
+        self.windows.append(windows)
+        self.digests.append(digest)
+        self.responses.append(response)
+        self.created.append(now)
+        if self.index is not None:
+            self.index.add(head)
+        if len(self.responses) > max_entries:
+            self.keep(list(range(len(self.responses) - max_entries, len(self.responses))))
+
+    def prune(self, ttl: float, now: float) -> None:
+        """Drop expired entries."""
+        fresh = [i for i, created in enumerate(self.created) if now - created <= ttl]
+        if len(fresh) < len(self.created):
+            self.keep(fresh)
+
+    def keep(self, rows: List[int]) -> None:
+        self.windows = [self.windows[i] for i in rows]
+        self.digests = [self.digests[i] for i in rows]
+        self.responses = [self.responses[i] for i in rows]
+        self.created = [self.created[i] for i in rows]
+        self.heads = self.heads[rows] if rows else None
+        self.index = None  # rebuilt on next search
+
+
+class SemanticPromptCache:
+    """
+    Embedding-keyed cache in front of LLM calls.
+
+    Entries are partitioned by an exact hash of the system prompt and matched on
+    the user prompt's embeddings, one per WINDOW_CHARS window, all of which must
+    clear the threshold. A prompt that differs only past the embedder's input
+    limit therefore doesn't match. With exact=True only the same user prompt
+    hits. Persisted to one pickle per model file.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.95, ttl: float = 3600,
+                 max_entries: int = 1024):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._partitions: Optional[Dict[str, _Partition]] = None
+
+    async def get_or_compute(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        compute: Callable[[], Awaitable[str]],
+        threshold: Optional[float] = None,
+        ttl: Optional[float] = None,
+        exact: bool = False
+    ) -> str:
+        """Return a cached response for a near-identical prompt, or await compute() and cache it."""
+        threshold = self.threshold if threshold is None else threshold
+        ttl = self.ttl if ttl is None else ttl
+
+        partition = self._get_partition(system_prompt)
+        digest = _digest(user_prompt)
+        cached = partition.find_exact(digest, ttl, time.time())
+        windows = None
+        if cached is None and not exact:
+            windows = await self._embed(_windows(user_prompt))
+            if windows is not None:
+                cached = partition.search(windows, threshold, ttl, time.time())
+        if cached is not None:
+            print("⚡ Prompt cache hit")
+            return cached
+
+        response = await compute()
+
+        if windows is None:
+            windows = await self._embed(_windows(user_prompt))
+        if windows is not None:
+            partition.add(windows, digest, response, time.time(), self.max_entries)
+            await self._save(ttl)
+        return response
+
+    def _get_partition(self, system_prompt: str) -> _Partition:
+        if self._partitions is None:
+            self._partitions = self._load()
+        key = _digest(system_prompt)
+        if key not in self._partitions:
+            self._partitions[key] = _Partition()
+        return self._partitions[key]
+
+    async def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Unit-length embeddings of texts, one row each (None if the embedder is unavailable)."""
+        try:
+            from app.services.document_processor_mongodb import get_embedder
+
+            embedder = get_embedder()
+            embeddings = await asyncio.to_thread(
+                embedder.encode, texts, show_progress_bar=False, normalize_embeddings=True
+            )
+            return np.asarray(embeddings, dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️  Prompt cache embedding failed: {e}")
+            return None
+
+    def _load(self) -> Dict[str, _Partition]:
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") != CACHE_FORMAT_VERSION:
+                return {}
+            return {key: _Partition(**fields) for key, fields in data["partitions"].items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️  Could not load prompt cache {self.path}: {e}")
+            return {}
+
+    async def _save(self, ttl: float) -> None:
+        now = time.time()
+        partitions = {}
+        for key, partition in self._partitions.items():
+            partition.prune(ttl, now)
+            if partition.responses:
+                partitions[key] = {
+                    "windows": list(partition.windows),
+                    "digests": list(partition.digests),
+                    "responses": list(partition.responses),
+                    "created": list(partition.created)
+                }
+        data = {"version": CACHE_FORMAT_VERSION, "partitions": partitions}
+        try:
+            await asyncio.to_thread(self._write, data)
+        except Exception as e:
+            print(f"⚠️  Could not save prompt cache {self.path}: {e}")
+
+    def _write(self, data: Dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{id(data)}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(data, f)
+        os.replace(tmp_path, self.path)
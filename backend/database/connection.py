@@ -2,30 +2,142 @@
 PostgreSQL database connection with pgvector support
 """
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.extras import RealDictCursor, Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from pgvector.psycopg2 import register_vector
+from collections import OrderedDict
 from contextlib import contextmanager
+import hashlib
+import io
+import itertools
 import os
+import re
+import threading
+import time
 from typing import Optional, List, Dict, Any
 import numpy as np
 from app.core.config import settings
 
+# Chunk batches larger than this are loaded with COPY instead of multi-row INSERT
+COPY_THRESHOLD = 5000
+
+# Hot single-row writes, prepared once per session so Postgres skips parse/plan per call:
+# name -> (parameter types, SQL with %s placeholders)
+HOT_STATEMENTS = {
+    "ins_lecture": ("int, int, text", """
+        INSERT INTO lectures (user_id, subject_id, title, status)
+        VALUES (%s, %s, %s, 'in_progress')
+        RETURNING id
+    """),
+    "ins_document": ("int, text, text, text, text", """
+        INSERT INTO documents (lecture_id, filename, file_type, file_path, content)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id
+    """),
+    "ins_transcription": ("int, int, text, text, text, float", """
+        INSERT INTO transcriptions 
+        (lecture_id, chunk_index, text, enhanced_notes, timestamp, importance)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (lecture_id, chunk_index) 
+        DO UPDATE SET text = EXCLUDED.text, 
+                      enhanced_notes = EXCLUDED.enhanced_notes,
+                      importance = EXCLUDED.importance
+        RETURNING id
+    """),
+    "ins_structured_notes": ("int, text, int", """
+        INSERT INTO structured_notes (lecture_id, content, transcription_count)
+        VALUES (%s, %s, %s)
+        RETURNING id
+    """),
+    "ins_final_notes": ("int, text, text, jsonb, jsonb, jsonb", """
+        INSERT INTO final_notes 
+        (lecture_id, title, markdown, sections, glossary, key_takeaways)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (lecture_id) 
+        DO UPDATE SET title = EXCLUDED.title,
+                      markdown = EXCLUDED.markdown,
+                      sections = EXCLUDED.sections,
+                      glossary = EXCLUDED.glossary,
+                      key_takeaways = EXCLUDED.key_takeaways,
+                      created_at = CURRENT_TIMESTAMP
+        RETURNING id
+    """),
+}
+
+def _prepare_statement(name: str, types: str, sql: str) -> str:
+    """PREPARE text for a HOT_STATEMENTS entry (%s placeholders become $1..$n)"""
+    numbers = itertools.count(1)
+    return f"PREPARE {name} ({types}) AS " + re.sub(r"%s", lambda _: f"${next(numbers)}", sql)
+
+PREPARED_STATEMENTS = {
+    name: _prepare_statement(name, types, sql) for name, (types, sql) in HOT_STATEMENTS.items()
+}
+
+def execute_hot(cursor, name: str, params: tuple) -> None:
+    """Run a HOT_STATEMENTS entry: EXECUTE when prepared on this connection, plain SQL otherwise"""
+    if getattr(cursor.connection, "statements_prepared", False):
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(HOT_STATEMENTS[name][1], params)
+
+class VectorConnection(psycopg2.extensions.connection):
+    """Connection that remembers its per-session setup (pgvector adapters, prepared statements)"""
+    vector_registered = False
+    statements_prepared = False
+
+class VectorConnectionPool(ThreadedConnectionPool):
+    """Thread-safe pool that registers pgvector and prepares hot statements on every connection"""
+    
+    def getconn(self, key=None):
+        conn = super().getconn(key)
+        if not conn.vector_registered:
+            try:
+                # numpy arrays go in as vector params and vector columns come back as numpy
+                register_vector(conn)
+                conn.vector_registered = True
+            except psycopg2.ProgrammingError:
+                pass  # extension not created yet (init_database creates it); retried next checkout
+            conn.rollback()
+        if not conn.statements_prepared:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("DEALLOCATE ALL")
+                    for statement in PREPARED_STATEMENTS.values():
+                        cursor.execute(statement)
+                conn.commit()
+                conn.statements_prepared = True
+            except psycopg2.Error:
+                conn.rollback()  # tables not created yet; execute_hot uses plain SQL until a later checkout succeeds
+        return conn
+
+# Recent similarity search results: key -> (lecture_id, stored_at, rows)
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_TTL = 300  # seconds
+
+# HNSW candidate list size for similarity search (pgvector default 40; higher = better recall, slower)
+HNSW_EF_SEARCH = 40
+_search_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+
 # Connection pool
-_pool: Optional[SimpleConnectionPool] = None
+_pool: Optional[VectorConnectionPool] = None
+_pool_lock = threading.Lock()
 
 def init_db_pool(min_conn: int = 1, max_conn: int = 10):
     """Initialize database connection pool"""
     global _pool
     
     if _pool is None:
-        database_url = os.getenv("DATABASE_URL", settings.DATABASE_URL)
-        
-        _pool = SimpleConnectionPool(
-            min_conn,
-            max_conn,
-            database_url
-        )
-        print(f"✅ Database connection pool initialized (min={min_conn}, max={max_conn})")
+        with _pool_lock:
+            if _pool is None:
+                database_url = os.getenv("DATABASE_URL", settings.DATABASE_URL)
+                
+                _pool = VectorConnectionPool(
+                    min_conn,
+                    max_conn,
+                    database_url,
+                    connection_factory=VectorConnection
+                )
+                print(f"✅ Database connection pool initialized (min={min_conn}, max={max_conn})")
     
     return _pool
 
@@ -89,125 +201,161 @@ def init_database():
     print("✅ Database schema initialized")
 
 # Vector operations for pgvector
+_VECTOR_FORMATS: Dict[int, str] = {}
+
 def numpy_to_pgvector(array: np.ndarray) -> str:
-    """Convert numpy array to pgvector format"""
-    return '[' + ','.join(map(str, array.tolist())) + ']'
+    """Convert numpy array to pgvector halfvec format (float16, formatted in one C-level pass)"""
+    values = np.asarray(array, dtype=np.float16).ravel()
+    fmt = _VECTOR_FORMATS.get(values.size)
+    if fmt is None:
+        # %.5g round-trips float16 exactly (the column stores halfvec)
+        fmt = _VECTOR_FORMATS[values.size] = '[' + ','.join(['%.5g'] * values.size) + ']'
+    return fmt % tuple(values.tolist())
 
 def pgvector_to_numpy(vector_str: str) -> np.ndarray:
-    """Convert pgvector string to numpy array"""
-    # Remove brackets and split
-    values = vector_str.strip('[]').split(',')
-    return np.array([float(v) for v in values])
+    """Convert pgvector string to numpy float32 array (parsed in C)"""
+    return np.fromstring(vector_str.strip('[]'), sep=',', dtype=np.float32)
 
 # Helper functions for common operations
 def create_lecture(user_id: int, subject_id: int, title: str) -> int:
     """Create a new lecture and return its ID"""
-    query = """
-        INSERT INTO lectures (user_id, subject_id, title, status)
-        VALUES (%s, %s, %s, 'in_progress')
-        RETURNING id
-    """
     with get_db_cursor() as cursor:
-        cursor.execute(query, (user_id, subject_id, title))
+        execute_hot(cursor, "ins_lecture", (user_id, subject_id, title))
         return cursor.fetchone()['id']
 
 def save_document(lecture_id: int, filename: str, file_type: str, 
                   file_path: str, content: str) -> int:
     """Save document metadata"""
-    query = """
-        INSERT INTO documents (lecture_id, filename, file_type, file_path, content)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING id
-    """
     with get_db_cursor() as cursor:
-        cursor.execute(query, (lecture_id, filename, file_type, file_path, content))
+        execute_hot(
+            cursor, "ins_document",
+            (lecture_id, filename, file_type, file_path, content)
+        )
         return cursor.fetchone()['id']
 
 def save_document_chunks(chunks: List[Dict[str, Any]]) -> None:
     """Batch insert document chunks with embeddings"""
-    query = """
-        INSERT INTO document_chunks 
-        (document_id, lecture_id, chunk_text, chunk_index, embedding)
-        VALUES (%s, %s, %s, %s, %s::vector)
-        ON CONFLICT (document_id, chunk_index) DO NOTHING
-    """
-    
     params_list = [
         (
             chunk['document_id'],
             chunk['lecture_id'],
             chunk['text'],
             chunk['index'],
-            numpy_to_pgvector(chunk['embedding'])
+            np.asarray(chunk['embedding'], dtype=np.float32)  # adapted by pgvector
         )
         for chunk in chunks
     ]
     
-    execute_many(query, params_list)
+    with get_db_cursor(dict_cursor=False) as cursor:
+        if len(params_list) > COPY_THRESHOLD:
+            _copy_document_chunks(cursor, params_list)
+        else:
+            # One multi-row INSERT per 500 chunks instead of one round-trip per chunk
+            execute_values(
+                cursor,
+                """
+                INSERT INTO document_chunks 
+                (document_id, lecture_id, chunk_text, chunk_index, embedding)
+                VALUES %s
+                ON CONFLICT (document_id, chunk_index) DO NOTHING
+                """,
+                params_list,
+                template="(%s, %s, %s, %s, %s::halfvec)",
+                page_size=500
+            )
+    _invalidate_search_cache(chunk['lecture_id'] for chunk in chunks)
     print(f"✅ Saved {len(chunks)} document chunks with embeddings")
 
+def _copy_escape(value: str) -> str:
+    """Escape a value for COPY text format"""
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+                 .replace('\n', '\\n').replace('\r', '\\r'))
+
+def _copy_document_chunks(cursor, params_list: List[tuple]) -> None:
+    """Bulk load chunks with COPY (via a staging table so ON CONFLICT still applies)"""
+    cursor.execute("""
+        CREATE TEMP TABLE document_chunks_staging ON COMMIT DROP AS
+        SELECT document_id, lecture_id, chunk_text, chunk_index, embedding
+        FROM document_chunks WITH NO DATA
+    """)
+    
+    buffer = io.StringIO()
+    for document_id, lecture_id, text, index, embedding in params_list:
+        buffer.write(
+            f"{document_id}\t{lecture_id}\t{_copy_escape(text)}\t{index}\t{numpy_to_pgvector(embedding)}\n"
+        )
+    buffer.seek(0)
+    
+    cursor.copy_expert(
+        "COPY document_chunks_staging (document_id, lecture_id, chunk_text, chunk_index, embedding) "
+        "FROM STDIN WITH (FORMAT text)",
+        buffer
+    )
+    cursor.execute("""
+        INSERT INTO document_chunks 
+        (document_id, lecture_id, chunk_text, chunk_index, embedding)
+        SELECT document_id, lecture_id, chunk_text, chunk_index, embedding
+        FROM document_chunks_staging
+        ON CONFLICT (document_id, chunk_index) DO NOTHING
+    """)
+
 def search_similar_chunks(query_embedding: np.ndarray, lecture_id: int, 
                          top_k: int = 10) -> List[Dict]:
     """Search for similar document chunks using pgvector"""
+    embedding = np.asarray(query_embedding, dtype=np.float32)  # adapted by pgvector
+    
+    key = hashlib.blake2b(
+        f"{lecture_id}:{top_k}:".encode() + embedding.tobytes(), digest_size=16
+    ).digest()
+    cached = _search_cache.get(key)
+    if cached is not None and time.monotonic() - cached[1] <= SEARCH_CACHE_TTL:
+        _search_cache.move_to_end(key)
+        return [dict(row) for row in cached[2]]  # callers may mutate their rows
+    
     query = """
-        SELECT * FROM search_similar_chunks(%s::vector, %s, %s)
+        SELECT * FROM search_similar_chunks(%s::halfvec, %s, %s)
     """
     
-    embedding_str = numpy_to_pgvector(query_embedding)
-    
     with get_db_cursor() as cursor:
-        cursor.execute(query, (embedding_str, lecture_id, top_k))
-        return cursor.fetchall()
+        # Scoped to this transaction, so pooled connections keep the server default
+        cursor.execute("SET LOCAL hnsw.ef_search = %s", (max(HNSW_EF_SEARCH, top_k),))
+        cursor.execute(query, (embedding, lecture_id, top_k))
+        rows = cursor.fetchall()
+    
+    _search_cache[key] = (lecture_id, time.monotonic(), rows)
+    _search_cache.move_to_end(key)
+    if len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+    return [dict(row) for row in rows]
+
+def _invalidate_search_cache(lecture_ids) -> None:
+    """Drop cached search results for lectures whose chunks changed"""
+    lecture_ids = set(lecture_ids)
+    for key in [k for k, (lid, _, _) in _search_cache.items() if lid in lecture_ids]:
+        del _search_cache[key]
 
 def save_transcription(lecture_id: int, chunk_index: int, text: str,
                       enhanced_notes: str, timestamp: str, importance: float) -> int:
     """Save transcription chunk"""
-    query = """
-        INSERT INTO transcriptions 
-        (lecture_id, chunk_index, text, enhanced_notes, timestamp, importance)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ON CONFLICT (lecture_id, chunk_index) 
-        DO UPDATE SET text = EXCLUDED.text, 
-                      enhanced_notes = EXCLUDED.enhanced_notes,
-                      importance = EXCLUDED.importance
-        RETURNING id
-    """
     with get_db_cursor() as cursor:
-        cursor.execute(query, (lecture_id, chunk_index, text, enhanced_notes, 
-                              timestamp, importance))
+        execute_hot(cursor, "ins_transcription",
+                    (lecture_id, chunk_index, text, enhanced_notes, timestamp, importance))
         return cursor.fetchone()['id']
 
 def save_structured_notes(lecture_id: int, content: str, 
                          transcription_count: int) -> int:
     """Save structured notes"""
-    query = """
-        INSERT INTO structured_notes (lecture_id, content, transcription_count)
-        VALUES (%s, %s, %s)
-        RETURNING id
-    """
     with get_db_cursor() as cursor:
-        cursor.execute(query, (lecture_id, content, transcription_count))
+        execute_hot(cursor, "ins_structured_notes",
+                    (lecture_id, content, transcription_count))
         return cursor.fetchone()['id']
 
 def save_final_notes(lecture_id: int, title: str, markdown: str,
                     sections: List[Dict], glossary: Dict, 
                     key_takeaways: List[str]) -> int:
     """Save final comprehensive notes"""
-    query = """
-        INSERT INTO final_notes 
-        (lecture_id, title, markdown, sections, glossary, key_takeaways)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ON CONFLICT (lecture_id) 
-        DO UPDATE SET title = EXCLUDED.title,
-                      markdown = EXCLUDED.markdown,
-                      sections = EXCLUDED.sections,
-                      glossary = EXCLUDED.glossary,
-                      key_takeaways = EXCLUDED.key_takeaways,
-                      created_at = CURRENT_TIMESTAMP
-        RETURNING id
-    """
     with get_db_cursor() as cursor:
-        cursor.execute(query, (
+        execute_hot(cursor, "ins_final_notes", (
             lecture_id, title, markdown,
             Json(sections), Json(glossary), Json(key_takeaways)
         ))
@@ -215,18 +363,39 @@ def save_final_notes(lecture_id: int, title: str, markdown: str,
 
 def get_lecture_data(lecture_id: int) -> Dict:
     """Get complete lecture data"""
+    # Each child table is aggregated once (via its lecture_id index), then joined
     query = """
+        WITH t AS (
+            SELECT lecture_id, json_agg(t.*) AS j
+            FROM transcriptions t WHERE lecture_id = %(lecture_id)s
+            GROUP BY lecture_id
+        ), s AS (
+            SELECT lecture_id, json_agg(s.*) AS j
+            FROM structured_notes s WHERE lecture_id = %(lecture_id)s
+            GROUP BY lecture_id
+        ), d AS (
+            SELECT lecture_id, json_agg(d.*) AS j
+            FROM documents d WHERE lecture_id = %(lecture_id)s
+            GROUP BY lecture_id
+        ), f AS (
+            SELECT lecture_id, row_to_json(f.*) AS j
+            FROM final_notes f WHERE lecture_id = %(lecture_id)s
+        )
         SELECT 
             l.*,
-            (SELECT json_agg(t.*) FROM transcriptions t WHERE t.lecture_id = l.id) as transcriptions,
-            (SELECT json_agg(s.*) FROM structured_notes s WHERE s.lecture_id = l.id) as structured_notes,
-            (SELECT json_agg(d.*) FROM documents d WHERE d.lecture_id = l.id) as documents,
-            (SELECT row_to_json(f.*) FROM final_notes f WHERE f.lecture_id = l.id) as final_notes
+            t.j as transcriptions,
+            s.j as structured_notes,
+            d.j as documents,
+            f.j as final_notes
         FROM lectures l
-        WHERE l.id = %s
+        LEFT JOIN t ON t.lecture_id = l.id
+        LEFT JOIN s ON s.lecture_id = l.id
+        LEFT JOIN d ON d.lecture_id = l.id
+        LEFT JOIN f ON f.lecture_id = l.id
+        WHERE l.id = %(lecture_id)s
     """
     with get_db_cursor() as cursor:
-        cursor.execute(query, (lecture_id,))
+        cursor.execute(query, {"lecture_id": lecture_id})
         return cursor.fetchone()
 
 def mark_document_processed(document_id: int) -> None:
@@ -2,18 +2,68 @@
 MongoDB Atlas connection with Vector Search support
 Much simpler than PostgreSQL + pgvector!
 """
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import AsyncMongoClient, IndexModel, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from gridfs import AsyncGridFSBucket
+from bson import Binary, ObjectId
+from bson.codec_options import CodecOptions, TypeCodec, TypeRegistry
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Optional, List, Dict, Any
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import threading
 from app.core.config import settings
 
+# Try to import FAISS (large-lecture fallback search; NumPy without it)
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except Exception:
+    FAISS_AVAILABLE = False
+
+# Try to import zstandard (compresses large document bodies before GridFS)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except Exception:
+    ZSTD_AVAILABLE = False
+
+# BSON BinData vector (subtype 9): 1-byte dtype (0x27 = float32) + 1-byte padding + data
+VECTOR_SUBTYPE = 9
+FLOAT32_VECTOR_HEADER = b"\x27\x00"
+
+# $vectorSearch numCandidates = top_k * this (HNSW recall vs latency)
+VECTOR_SEARCH_CANDIDATE_FACTOR = 20
+
+# Document bodies larger than this (UTF-8 bytes) go to GridFS instead of inline "content"
+GRIDFS_CONTENT_THRESHOLD = 1_000_000
+
+# Embedding documents per insert_many call (~1.6 MB of float32 BinData at 384 dims)
+EMBEDDING_INSERT_BATCH = 1000
+
+@dataclass(frozen=True)
+class _Collections:
+    """Collection handles used by the CRUD helpers, bound once in init_mongodb"""
+    lectures: Any
+    documents: Any
+    embeddings: Any  # document_embeddings with NumpyCodec
+    embeddings_ingest: Any  # same, with a relaxed write concern for bulk loads
+    transcriptions: Any
+    structured_notes: Any
+    final_notes: Any
+    content_files: Any  # GridFS bucket for large document bodies
+    embedding_cache: Any  # content-hash -> float32 embedding, relaxed write concern
+
 # Global MongoDB client
-_client: Optional[AsyncIOMotorClient] = None
-_sync_client: Optional[MongoClient] = None
+_client: Optional[AsyncMongoClient] = None
 _db = None
+_collections: Optional[_Collections] = None
+_init_lock = threading.Lock()
 
 def get_mongodb_url() -> str:
     """Get MongoDB connection URL from environment"""
@@ -21,39 +71,72 @@ def get_mongodb_url() -> str:
     return os.getenv("MONGODB_URL", settings.MONGODB_URL)
 
 def init_mongodb():
-    """Initialize MongoDB connection"""
-    global _client, _sync_client, _db
-    
-    mongodb_url = get_mongodb_url()
-    if mongodb_url:
-        print("hai")
-    else: print("nhi")
-    print(f"🔗 Connecting to: {mongodb_url[:50]}...")  # Debug: show connection URL
-    
-    # Async client for FastAPI
-    _client = AsyncIOMotorClient(mongodb_url)
-    _db = _client.eduscribe
+    """Initialize MongoDB connection (idempotent: one client and pool per process)"""
+    global _client, _db, _collections
     
-    # Sync client for non-async operations
-    _sync_client = MongoClient(mongodb_url)
-    
-    print("✅ MongoDB Atlas connected successfully!")
-    return _db
+    with _init_lock:
+        if _db is not None:
+            return _db
+        
+        mongodb_url = get_mongodb_url()
+        print(f"🔗 Connecting to: {mongodb_url[:50]}...")  # Debug: show connection URL
+        
+        # Native asyncio client for FastAPI (no executor hop per operation, unlike Motor);
+        # compressors the server doesn't support or aren't installed are skipped
+        _client = AsyncMongoClient(
+            mongodb_url,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=2000,  # fail fast instead of piling up behind a full pool
+            serverSelectionTimeoutMS=5000,
+            retryWrites=True,
+            compressors="zstd,snappy"
+        )
+        _db = _client.eduscribe
+        _collections = _Collections(
+            lectures=_db.lectures,
+            documents=_db.documents,
+            embeddings=_db.get_collection("document_embeddings", codec_options=EMBEDDING_CODEC_OPTIONS),
+            # Bulk ingest is re-runnable from the source documents, so primary-only,
+            # unjournaled acks are enough; everything else keeps the default concern
+            embeddings_ingest=_db.get_collection(
+                "document_embeddings",
+                codec_options=EMBEDDING_CODEC_OPTIONS,
+                write_concern=WriteConcern(w=1, j=False)
+            ),
+            transcriptions=_db.transcriptions,
+            structured_notes=_db.structured_notes,
+            final_notes=_db.final_notes,
+            content_files=AsyncGridFSBucket(_db, bucket_name="document_content"),
+            # A lost cache entry only costs one recomputation
+            embedding_cache=_db.get_collection("embedding_cache", write_concern=WriteConcern(w=1, j=False))
+        )
+        
+        print("✅ MongoDB Atlas connected successfully!")
+        return _db
 
 def get_db():
     """Get database instance"""
-    global _db
-    if _db is None:
+    db = _db
+    if db is None:
+        db = init_mongodb()
+    return db
+
+def collections() -> "_Collections":
+    """Collections bound at init (no per-call database/collection lookups)"""
+    colls = _collections
+    if colls is None:
         init_mongodb()
-    return _db
+        colls = _collections
+    return colls
 
-def close_mongodb():
+async def close_mongodb():
     """Close MongoDB connections"""
-    global _client, _sync_client
-    if _client:
-        _client.close()
-    if _sync_client:
-        _sync_client.close()
+    global _client, _db, _collections
+    with _init_lock:
+        client, _client, _db, _collections = _client, None, None, None
+    if client:
+        await client.close()
     print("🔒 MongoDB connections closed")
 
 # Collection helpers
@@ -64,39 +147,87 @@ def get_collection(name: str):
 
 # Initialize collections and indexes
 async def setup_indexes():
-    """Create indexes for better query performance"""
+    """Create indexes for better query performance (one create_indexes per collection, all concurrent)"""
     db = get_db()
     
-    # Users collection
-    await db.users.create_index([("email", ASCENDING)], unique=True)
-    await db.users.create_index([("username", ASCENDING)], unique=True)
-    
-    # Lectures collection
-    await db.lectures.create_index([("user_id", ASCENDING)])
-    await db.lectures.create_index([("subject_id", ASCENDING)])
-    await db.lectures.create_index([("status", ASCENDING)])
-    await db.lectures.create_index([("created_at", DESCENDING)])
-    
-    # Documents collection
-    await db.documents.create_index([("lecture_id", ASCENDING)])
-    
-    # Document embeddings collection (for vector search)
-    await db.document_embeddings.create_index([("lecture_id", ASCENDING)])
-    await db.document_embeddings.create_index([("document_id", ASCENDING)])
-    
-    # Transcriptions collection
-    await db.transcriptions.create_index([("lecture_id", ASCENDING)])
-    await db.transcriptions.create_index([("lecture_id", ASCENDING), ("chunk_index", ASCENDING)], unique=True)
-    
-    # Structured notes collection
-    await db.structured_notes.create_index([("lecture_id", ASCENDING)])
-    await db.structured_notes.create_index([("created_at", DESCENDING)])
-    
-    # Final notes collection
-    await db.final_notes.create_index([("lecture_id", ASCENDING)], unique=True)
+    await asyncio.gather(
+        # Users collection
+        db.users.create_indexes([
+            IndexModel([("email", ASCENDING)], unique=True),
+            IndexModel([("username", ASCENDING)], unique=True)
+        ]),
+        
+        # Lectures collection
+        db.lectures.create_indexes([
+            IndexModel([("user_id", ASCENDING)]),
+            IndexModel([("subject_id", ASCENDING)]),
+            IndexModel([("status", ASCENDING)]),
+            IndexModel([("created_at", DESCENDING)])
+        ]),
+        
+        # Documents collection
+        db.documents.create_indexes([
+            IndexModel([("lecture_id", ASCENDING)])
+        ]),
+        
+        # Document embeddings collection (for vector search)
+        # Built once at startup (never on ingest) so bulk inserts don't block on index builds;
+        # the compound index serves every lecture_id filter (and chunk_index order)
+        _setup_embedding_indexes(db),
+        
+        # Transcriptions collection
+        db.transcriptions.create_indexes([
+            IndexModel([("lecture_id", ASCENDING)]),
+            IndexModel([("lecture_id", ASCENDING), ("chunk_index", ASCENDING)], unique=True)
+        ]),
+        
+        # Structured notes collection
+        db.structured_notes.create_indexes([
+            IndexModel([("lecture_id", ASCENDING)]),
+            IndexModel([("created_at", DESCENDING)])
+        ]),
+        
+        # Final notes collection
+        db.final_notes.create_indexes([
+            IndexModel([("lecture_id", ASCENDING)], unique=True)
+        ]),
+        
+        # Embedding cache (looked up by _id; entries expire so it can't grow without bound)
+        db.embedding_cache.create_indexes([
+            IndexModel(
+                [("created_at", ASCENDING)],
+                expireAfterSeconds=settings.EMBEDDING_CACHE_TTL_DAYS * 86400
+            )
+        ])
+    )
     
     print("✅ MongoDB indexes created successfully!")
 
+async def _setup_embedding_indexes(db) -> None:
+    """Compound (lecture_id, chunk_index) index; drop the single-field ones it replaces first"""
+    existing = await db.document_embeddings.index_information()
+    # document_id is always filtered alongside lecture_id, behind the compound index
+    for name in ("lecture_id_1", "document_id_1"):
+        if name in existing:
+            await db.document_embeddings.drop_index(name)
+    await db.document_embeddings.create_indexes([
+        IndexModel([("lecture_id", ASCENDING), ("chunk_index", ASCENDING)], background=True),
+        # Removes documents once their expires_at passes (only set when EMBEDDING_TTL_DAYS is)
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, background=True)
+    ])
+
+async def backfill_embeddings_active() -> int:
+    """
+    One-off migration: mark embeddings saved before the active flag existed as live
+    
+    Searches only return active chunks, so run this once after upgrading
+    (python migrate_embeddings_active.py). Returns the number of chunks updated.
+    """
+    result = await collections().embeddings.update_many(
+        {"active": {"$exists": False}}, {"$set": {"active": True}}
+    )
+    return result.modified_count
+
 # Vector Search Setup (Atlas Search Index)
 def create_vector_search_index_config():
     """
@@ -104,37 +235,129 @@ def create_vector_search_index_config():
     
     TO CREATE THIS INDEX:
     1. Go to MongoDB Atlas Dashboard
-    2. Click on your cluster → "Search" tab
-    3. Click "Create Search Index"
+    2. Click on your cluster → "Atlas Search" tab
+    3. Click "Create Search Index" → "Atlas Vector Search"
     4. Choose "JSON Editor"
     5. Paste the configuration below
     6. Index name: "vector_search"
     7. Collection: "document_embeddings"
     """
     return {
-        "mappings": {
-            "dynamic": True,
-            "fields": {
-                "embedding": {
-                    "type": "knnVector",
-                    "dimensions": 384,  # all-MiniLM-L6-v2 dimensions
-                    "similarity": "cosine"
-                },
-                "lecture_id": {
-                    "type": "string"
-                },
-                "document_id": {
-                    "type": "string"
-                }
+        "fields": [
+            {
+                "type": "vector",
+                "path": "embedding",
+                "numDimensions": 384,  # all-MiniLM-L6-v2 dimensions
+                "similarity": "cosine"
+            },
+            {
+                "type": "filter",
+                "path": "lecture_id"
+            },
+            {
+                "type": "filter",
+                "path": "document_id"
+            },
+            {
+                "type": "filter",
+                "path": "active"
             }
-        }
+        ]
     }
 
+# Embedding storage format
+class NumpyCodec(TypeCodec):
+    """
+    float32 ndarray <-> BSON BinData vector, applied during BSON encode/decode
+    
+    Only subtype 9 values are decoded (subtype 0 binaries come back as bytes),
+    so float16/int8 embeddings are left for decode_embedding.
+    """
+    python_type = np.ndarray
+    bson_type = Binary
+    
+    def transform_python(self, value: np.ndarray) -> Binary:
+        data = np.ascontiguousarray(value, dtype=np.float32).tobytes()
+        return Binary(FLOAT32_VECTOR_HEADER + data, VECTOR_SUBTYPE)
+    
+    def transform_bson(self, value: Binary):
+        if value.subtype == VECTOR_SUBTYPE and value[:2] == FLOAT32_VECTOR_HEADER:
+            return np.frombuffer(value, dtype=np.float32, offset=2)  # zero-copy, read-only
+        return value
+
+EMBEDDING_CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry([NumpyCodec()]))
+
+def get_embeddings_collection():
+    """document_embeddings with NumpyCodec applied"""
+    return collections().embeddings
+
+def encode_embedding(embedding) -> Dict[str, Any]:
+    """
+    Pack an embedding into document fields per settings.EMBEDDING_STORAGE_DTYPE
+    
+    - float32: BSON BinData vector (subtype 9) of float32, 4 bytes/dim, read
+      natively by Atlas $vectorSearch (packed/unpacked by NumpyCodec)
+    - array: BSON array of doubles (pre-BinData documents)
+    - float16: raw half-precision bytes (2 bytes/dim)
+    - int8: per-vector scaled int8 bytes (1 byte/dim) + "embedding_scale"
+    
+    Vectors are stored unit-length, so search scores with a plain dot product.
+    """
+    vector = np.array(embedding, dtype=np.float32)
+    vector /= np.linalg.norm(vector) + 1e-12
+    dtype = settings.EMBEDDING_STORAGE_DTYPE
+    
+    if dtype == "float32":
+        # Packed by NumpyCodec when the document is encoded
+        return {"embedding": vector, "embedding_dtype": "float32"}
+    if dtype == "float16":
+        return {
+            "embedding": Binary(vector.astype(np.float16).tobytes()),
+            "embedding_dtype": "float16"
+        }
+    if dtype == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        return {
+            "embedding": Binary(np.round(vector / scale).astype(np.int8).tobytes()),
+            "embedding_dtype": "int8",
+            "embedding_scale": scale
+        }
+    return {"embedding": vector.tolist()}
+
+def decode_embedding(doc: Dict[str, Any]) -> np.ndarray:
+    """Unpack a stored embedding (any storage format) to a float32 vector"""
+    embedding = doc["embedding"]
+    dtype = doc.get("embedding_dtype")
+    
+    if isinstance(embedding, np.ndarray):
+        # BinData vector, already unpacked by NumpyCodec
+        return embedding
+    if dtype == "float32":
+        # Raw float32 bytes (written before BinData vectors)
+        return np.frombuffer(embedding, dtype=np.float32)
+    if dtype == "float16":
+        return np.frombuffer(embedding, dtype=np.float16).astype(np.float32)
+    if dtype == "int8":
+        return np.frombuffer(embedding, dtype=np.int8).astype(np.float32) * doc["embedding_scale"]
+    # Legacy BSON arrays
+    return np.asarray(embedding, dtype=np.float32)
+
+def _oid(value):
+    """
+    ObjectId for a stringified _id (as returned by create_lecture/save_document)
+    
+    Strings that aren't ObjectIds (e.g. "lecture-<timestamp>" ids) pass through,
+    so both kinds of _id still match their index.
+    """
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
 # CRUD Operations
 
 async def create_lecture(user_id: str, subject_id: str, title: str) -> str:
     """Create a new lecture"""
-    db = get_db()
+    colls = collections()
     
     lecture = {
         "user_id": user_id,
@@ -147,29 +370,76 @@ async def create_lecture(user_id: str, subject_id: str, title: str) -> str:
         "updated_at": datetime.utcnow()
     }
     
-    result = await db.lectures.insert_one(lecture)
+    result = await colls.lectures.insert_one(lecture)
     return str(result.inserted_id)
 
+async def _content_fields(lecture_id: str, filename: str, content: str) -> Dict[str, Any]:
+    """
+    Document fields holding the body
+    
+    Bodies over GRIDFS_CONTENT_THRESHOLD are stored in GridFS (zstd-compressed
+    when available) and referenced by "content_ref"; see load_document_content.
+    """
+    data = content.encode("utf-8")
+    if len(data) <= GRIDFS_CONTENT_THRESHOLD:
+        return {"file_size": len(content), "content": content}
+    
+    compression = None
+    if ZSTD_AVAILABLE:
+        data = await asyncio.to_thread(zstandard.ZstdCompressor(level=3).compress, data)
+        compression = "zstd"
+    content_ref = await collections().content_files.upload_from_stream(
+        filename, data, metadata={"lecture_id": lecture_id, "compression": compression}
+    )
+    return {"file_size": len(content), "content_ref": content_ref, "content_compression": compression}
+
 async def save_document(lecture_id: str, filename: str, file_type: str, 
                        file_path: str, content: str) -> str:
-    """Save document metadata"""
-    db = get_db()
+    """Save document metadata (body stored as in _content_fields)"""
+    colls = collections()
     
     document = {
         "lecture_id": lecture_id,
         "filename": filename,
         "file_type": file_type,
         "file_path": file_path,
-        "content": content,
-        "file_size": len(content),
+        **await _content_fields(lecture_id, filename, content),
         "metadata": {},
         "upload_date": datetime.utcnow(),
         "processed": False
     }
     
-    result = await db.documents.insert_one(document)
+    result = await colls.documents.insert_one(document)
     return str(result.inserted_id)
 
+async def set_document_content(document_id: str, lecture_id: str, filename: str, content: str) -> None:
+    """Store the body of a document saved before its text was known"""
+    await collections().documents.update_one(
+        {"_id": _oid(document_id)},
+        {"$set": await _content_fields(lecture_id, filename, content)}
+    )
+
+async def delete_document(document_id: str, lecture_id: str) -> None:
+    """Delete a document record and any embeddings saved for it"""
+    colls = collections()
+    await asyncio.gather(
+        colls.documents.delete_one({"_id": _oid(document_id)}),
+        # lecture_id lets this use the (lecture_id, chunk_index) index
+        colls.embeddings.delete_many({"lecture_id": lecture_id, "document_id": document_id})
+    )
+    _matrix_cache.pop(lecture_id, None)
+
+async def load_document_content(document: Dict[str, Any]) -> str:
+    """Body of a saved document, inline or from GridFS"""
+    if "content_ref" not in document:
+        return document.get("content", "")
+    
+    stream = await collections().content_files.open_download_stream(document["content_ref"])
+    data = await stream.read()
+    if document.get("content_compression") == "zstd":
+        data = await asyncio.to_thread(zstandard.ZstdDecompressor().decompress, data)
+    return data.decode("utf-8")
+
 async def save_document_embeddings(embeddings_data: List[Dict[str, Any]]) -> None:
     """
     Save document chunks with embeddings for vector search
@@ -186,9 +456,13 @@ async def save_document_embeddings(embeddings_data: List[Dict[str, Any]]) -> Non
         ...
     ]
     """
-    db = get_db()
+    embeddings = collections().embeddings_ingest
     
-    # Convert numpy arrays to lists for MongoDB
+    # Opt-in expiry (TTL index on expires_at); without it embeddings are kept until archived
+    now = datetime.utcnow()
+    expires_at = now + timedelta(days=settings.EMBEDDING_TTL_DAYS) if settings.EMBEDDING_TTL_DAYS else None
+    
+    # Pack embeddings in the configured storage format
     documents = []
     for item in embeddings_data:
         doc = {
@@ -196,16 +470,73 @@ async def save_document_embeddings(embeddings_data: List[Dict[str, Any]]) -> Non
             "document_id": item['document_id'],
             "chunk_text": item['chunk_text'],
             "chunk_index": item['chunk_index'],
-            "embedding": item['embedding'].tolist() if isinstance(item['embedding'], np.ndarray) else item['embedding'],
+            **encode_embedding(item['embedding']),
             "metadata": item.get('metadata', {}),
-            "created_at": datetime.utcnow()
+            "active": True,
+            "created_at": now
         }
+        if expires_at:
+            doc["expires_at"] = expires_at
         documents.append(doc)
     
     if documents:
-        await db.document_embeddings.insert_many(documents)
+        # Cached search matrices for these lectures are now stale
+        for lecture_id in {doc["lecture_id"] for doc in documents}:
+            _matrix_cache.pop(lecture_id, None)
+        
+        # Fixed-size unordered batches sent concurrently: bounded message size, and a
+        # failure in one batch doesn't stop the others
+        await asyncio.gather(*[
+            embeddings.insert_many(
+                documents[i:i + EMBEDDING_INSERT_BATCH],
+                ordered=False,
+                bypass_document_validation=True
+            )
+            for i in range(0, len(documents), EMBEDDING_INSERT_BATCH)
+        ])
         print(f"✅ Saved {len(documents)} document embeddings")
 
+async def get_cached_embeddings(keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+    """Cached float32 embeddings for the given content-hash keys (missing keys are absent)"""
+    cursor = collections().embedding_cache.find(
+        {"_id": {"$in": [Binary(key) for key in keys]}}, {"embedding": 1}
+    )
+    return {
+        bytes(doc["_id"]): np.frombuffer(doc["embedding"], dtype=np.float32)
+        async for doc in cursor
+    }
+
+async def cache_embeddings(entries: Dict[bytes, np.ndarray], model: str) -> None:
+    """Store embeddings under their content-hash keys (keys already cached are left as they are)"""
+    now = datetime.utcnow()
+    try:
+        await collections().embedding_cache.insert_many([
+            {
+                "_id": Binary(key),
+                "model": model,
+                "embedding": Binary(np.asarray(embedding, dtype=np.float32).tobytes()),
+                "created_at": now
+            }
+            for key, embedding in entries.items()
+        ], ordered=False)
+    except BulkWriteError as e:
+        # Concurrent ingests of the same text race on the key; anything else is real
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+async def set_lecture_embeddings_active(lecture_id: str, active: bool) -> int:
+    """
+    Archive (active=False) or restore a lecture's embeddings
+    
+    Archived chunks are kept but skipped by both search paths. Returns the
+    number of chunks changed.
+    """
+    result = await collections().embeddings.update_many(
+        {"lecture_id": lecture_id, "active": not active}, {"$set": {"active": active}}
+    )
+    _matrix_cache.pop(lecture_id, None)
+    return result.modified_count
+
 async def vector_search(query_embedding: np.ndarray, lecture_id: str, 
                        top_k: int = 10) -> List[Dict]:
     """
@@ -214,42 +545,40 @@ async def vector_search(query_embedding: np.ndarray, lecture_id: str,
     NOTE: Requires Atlas Search Index to be created first!
     See create_vector_search_index_config() for setup instructions.
     """
-    db = get_db()
+    colls = collections()
     
     # Convert numpy array to list
     query_vector = query_embedding.tolist() if isinstance(query_embedding, np.ndarray) else query_embedding
     
-    # MongoDB Atlas Vector Search aggregation pipeline
+    # MongoDB Atlas Vector Search aggregation pipeline (filter is applied inside the ANN scan)
     pipeline = [
         {
-            "$search": {
-                "index": "vector_search",  # Name of your Atlas Search index
-                "knnBeta": {
-                    "vector": query_vector,
-                    "path": "embedding",
-                    "k": top_k,
-                    "filter": {
-                        "lecture_id": lecture_id
-                    }
+            "$vectorSearch": {
+                "index": "vector_search",  # Name of your Atlas Vector Search index
+                "path": "embedding",
+                "queryVector": query_vector,
+                "numCandidates": top_k * VECTOR_SEARCH_CANDIDATE_FACTOR,
+                "limit": top_k,
+                "filter": {
+                    "lecture_id": lecture_id,
+                    "active": True
                 }
             }
         },
         {
+            # Only result fields leave the server (never the stored vector)
             "$project": {
                 "_id": 1,
                 "chunk_text": 1,
                 "document_id": 1,
                 "chunk_index": 1,
-                "score": {"$meta": "searchScore"}
+                "score": {"$meta": "vectorSearchScore"}
             }
-        },
-        {
-            "$limit": top_k
         }
     ]
     
     results = []
-    async for doc in db.document_embeddings.aggregate(pipeline):
+    async for doc in await colls.embeddings.aggregate(pipeline):
         results.append({
             "chunk_id": str(doc["_id"]),
             "chunk_text": doc["chunk_text"],
@@ -259,42 +588,139 @@ async def vector_search(query_embedding: np.ndarray, lecture_id: str,
     
     return results
 
+# Fields simple_vector_search scores with (skips metadata/created_at and other payload)
+EMBEDDING_SEARCH_PROJECTION = {
+    "embedding": 1,
+    "embedding_dtype": 1,
+    "embedding_scale": 1,
+    "document_id": 1
+}
+
+# Lectures with more chunks than this are scored with FAISS (when installed)
+LARGE_SEARCH_THRESHOLD = 10_000
+# Per-lecture embedding matrices kept in memory between searches
+MATRIX_CACHE_SIZE = 8
+MATRIX_CACHE_TTL = 300  # seconds (other workers may have added chunks)
+
+@dataclass
+class _LectureMatrix:
+    """A lecture's unit-length embeddings, row-aligned with their chunk ids"""
+    ids: List[Any]
+    document_ids: List[Any]
+    matrix: np.ndarray
+    loaded_at: float
+    index: Any = None  # faiss.IndexFlatIP, built on first large search
+
+_matrix_cache: "OrderedDict[str, _LectureMatrix]" = OrderedDict()
+
+def _get_cached_matrix(lecture_id: str) -> Optional[_LectureMatrix]:
+    entry = _matrix_cache.get(lecture_id)
+    if entry is None:
+        return None
+    if time.monotonic() - entry.loaded_at > MATRIX_CACHE_TTL:
+        del _matrix_cache[lecture_id]
+        return None
+    _matrix_cache.move_to_end(lecture_id)
+    return entry
+
+def _cache_matrix(lecture_id: str, entry: _LectureMatrix) -> None:
+    _matrix_cache[lecture_id] = entry
+    _matrix_cache.move_to_end(lecture_id)
+    if len(_matrix_cache) > MATRIX_CACHE_SIZE:
+        _matrix_cache.popitem(last=False)
+
+def _top_k(entry: _LectureMatrix, query: np.ndarray, k: int):
+    """(row indices, scores) of the k best rows, best first"""
+    if FAISS_AVAILABLE and len(entry.ids) > LARGE_SEARCH_THRESHOLD:
+        # SIMD inner-product scan with an in-kernel heap (no full-N score array)
+        if entry.index is None:
+            entry.index = faiss.IndexFlatIP(entry.matrix.shape[1])
+            entry.index.add(entry.matrix)
+        scores, rows = entry.index.search(query[None, :], k)
+        return rows[0], scores[0]
+    
+    similarities = entry.matrix @ query
+    # Top-k without sorting every similarity
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top])]
+    return top, similarities[top]
+
 # Fallback: Simple cosine similarity (if Atlas Search not available)
 async def simple_vector_search(query_embedding: np.ndarray, lecture_id: str, 
-                              top_k: int = 10) -> List[Dict]:
+                              top_k: int = 10, defer_text: bool = True) -> List[Dict]:
     """
     Fallback vector search using simple cosine similarity
     Use this if Atlas Search index is not set up yet
-    """
-    db = get_db()
     
-    # Get all embeddings for this lecture
-    cursor = db.document_embeddings.find({"lecture_id": lecture_id})
-    
-    results = []
-    async for doc in cursor:
-        # Calculate cosine similarity
-        doc_embedding = np.array(doc['embedding'])
-        similarity = np.dot(query_embedding, doc_embedding) / (
-            np.linalg.norm(query_embedding) * np.linalg.norm(doc_embedding)
-        )
+    All embeddings go into one contiguous float32 matrix (cached per lecture),
+    so scoring is a single matrix-vector product and top-k is an argpartition;
+    large lectures use a FAISS flat index instead. With defer_text, chunk_text
+    is fetched afterwards for the top_k winners only.
+    """
+    colls = collections()
+    texts = None
+    
+    entry = _get_cached_matrix(lecture_id)
+    if entry is None:
+        # Get all embeddings for this lecture (only the fields needed for scoring/results)
+        projection = EMBEDDING_SEARCH_PROJECTION if defer_text else {**EMBEDDING_SEARCH_PROJECTION, "chunk_text": 1}
+        docs = await colls.embeddings.find(
+            {"lecture_id": lecture_id, "active": True}, projection
+        ).to_list(length=None)
+        if not docs:
+            return []
         
-        results.append({
-            "chunk_id": str(doc["_id"]),
-            "chunk_text": doc["chunk_text"],
-            "similarity": float(similarity),
-            "document_id": doc["document_id"]
-        })
+        matrix = np.empty((len(docs), decode_embedding(docs[0]).shape[0]), dtype=np.float32)
+        legacy_rows = []
+        for i, doc in enumerate(docs):
+            matrix[i] = decode_embedding(doc)
+            if "embedding_dtype" not in doc:
+                legacy_rows.append(i)
+        
+        # Stored vectors are unit-length; only pre-normalization array rows need it here
+        if legacy_rows:
+            legacy = matrix[legacy_rows]
+            matrix[legacy_rows] = legacy / (np.linalg.norm(legacy, axis=1, keepdims=True) + 1e-12)
+        
+        entry = _LectureMatrix(
+            ids=[doc["_id"] for doc in docs],
+            document_ids=[doc["document_id"] for doc in docs],
+            matrix=matrix,
+            loaded_at=time.monotonic()
+        )
+        _cache_matrix(lecture_id, entry)
+        if not defer_text:
+            texts = {doc["_id"]: doc["chunk_text"] for doc in docs}
+    
+    query = np.array(query_embedding, dtype=np.float32).ravel()
+    query /= np.linalg.norm(query) + 1e-12
+    top, scores = _top_k(entry, query, min(top_k, len(entry.ids)))
+    
+    if texts is None:
+        # Second pass: text for the winners only
+        ids = [entry.ids[i] for i in top]
+        texts = {
+            doc["_id"]: doc["chunk_text"]
+            async for doc in colls.embeddings.find({"_id": {"$in": ids}}, {"chunk_text": 1})
+        }
     
-    # Sort by similarity and return top_k
-    results.sort(key=lambda x: x['similarity'], reverse=True)
-    return results[:top_k]
+    # Rows deleted since the matrix was cached have no text left; skip them
+    return [
+        {
+            "chunk_id": str(entry.ids[i]),
+            "chunk_text": texts[entry.ids[i]],
+            "similarity": float(score),
+            "document_id": entry.document_ids[i]
+        }
+        for i, score in zip(top, scores)
+        if entry.ids[i] in texts
+    ]
 
 async def save_transcription(lecture_id: str, chunk_index: int, text: str,
                             enhanced_notes: str, timestamp: str, 
                             importance: float) -> str:
     """Save transcription chunk"""
-    db = get_db()
+    colls = collections()
     
     transcription = {
         "lecture_id": lecture_id,
@@ -308,7 +734,7 @@ async def save_transcription(lecture_id: str, chunk_index: int, text: str,
     }
     
     # Upsert (update if exists, insert if not)
-    result = await db.transcriptions.update_one(
+    result = await colls.transcriptions.update_one(
         {"lecture_id": lecture_id, "chunk_index": chunk_index},
         {"$set": transcription},
         upsert=True
@@ -316,10 +742,46 @@ async def save_transcription(lecture_id: str, chunk_index: int, text: str,
     
     return str(result.upserted_id) if result.upserted_id else "updated"
 
+async def save_transcriptions_bulk(items: List[Dict[str, Any]]) -> int:
+    """
+    Upsert many transcription chunks in one unordered bulk_write
+    
+    items: dicts with the save_transcription arguments (lecture_id, chunk_index,
+    text, enhanced_notes, timestamp, importance). Returns the number written.
+    Where items repeat a (lecture_id, chunk_index) the last one wins, as with
+    sequential saves; the unordered batch never carries two ops on one key.
+    """
+    if not items:
+        return 0
+    colls = collections()
+    
+    latest = {(item["lecture_id"], item["chunk_index"]): item for item in items}
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"lecture_id": item["lecture_id"], "chunk_index": item["chunk_index"]},
+            {"$set": {
+                "lecture_id": item["lecture_id"],
+                "chunk_index": item["chunk_index"],
+                "text": item["text"],
+                "enhanced_notes": item["enhanced_notes"],
+                "timestamp": item["timestamp"],
+                "importance": item["importance"],
+                "metadata": item.get("metadata", {}),
+                "created_at": now
+            }},
+            upsert=True
+        )
+        for item in latest.values()
+    ]
+    
+    result = await colls.transcriptions.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
 async def save_structured_notes(lecture_id: str, content: str, 
                                transcription_count: int) -> str:
     """Save structured notes"""
-    db = get_db()
+    colls = collections()
     
     note = {
         "lecture_id": lecture_id,
@@ -329,14 +791,14 @@ async def save_structured_notes(lecture_id: str, content: str,
         "created_at": datetime.utcnow()
     }
     
-    result = await db.structured_notes.insert_one(note)
+    result = await colls.structured_notes.insert_one(note)
     return str(result.inserted_id)
 
 async def save_final_notes(lecture_id: str, title: str, markdown: str,
                           sections: List[Dict], glossary: Dict, 
                           key_takeaways: List[str]) -> str:
     """Save final comprehensive notes"""
-    db = get_db()
+    colls = collections()
     
     final_note = {
         "lecture_id": lecture_id,
@@ -350,7 +812,7 @@ async def save_final_notes(lecture_id: str, title: str, markdown: str,
     }
     
     # Upsert (one final note per lecture)
-    result = await db.final_notes.update_one(
+    result = await colls.final_notes.update_one(
         {"lecture_id": lecture_id},
         {"$set": final_note},
         upsert=True
@@ -358,37 +820,46 @@ async def save_final_notes(lecture_id: str, title: str, markdown: str,
     
     return str(result.upserted_id) if result.upserted_id else "updated"
 
-async def get_lecture_data(lecture_id: str) -> Dict:
-    """Get complete lecture with all related data"""
-    db = get_db()
+async def get_lecture_data(lecture_id: str, include_content: bool = True) -> Dict:
+    """
+    Get complete lecture with all related data
     
-    # Get lecture
-    lecture = await db.lectures.find_one({"_id": lecture_id})
+    include_content=False leaves out document text and every metadata field
+    (for listings/summaries that only need the lecture's shape).
+    """
+    colls = collections()
+    query = {"lecture_id": lecture_id}
+    light = None if include_content else {"metadata": 0}
+    light_documents = None if include_content else {"metadata": 0, "content": 0}
+    
+    # Lecture and its related data are independent lookups; fetch them concurrently
+    lecture, transcriptions, structured_notes, documents, final_notes = await asyncio.gather(
+        colls.lectures.find_one({"_id": _oid(lecture_id)}, light),
+        colls.transcriptions.find(query, light).to_list(length=None),
+        colls.structured_notes.find(query, light).to_list(length=None),
+        colls.documents.find(query, light_documents).to_list(length=None),
+        colls.final_notes.find_one(query, light)
+    )
     if not lecture:
         return None
     
-    # Get related data
-    lecture["transcriptions"] = await db.transcriptions.find(
-        {"lecture_id": lecture_id}
-    ).to_list(length=None)
+    if include_content:
+        # Large bodies live in GridFS; fetch them only when content was asked for
+        offloaded = [doc for doc in documents if "content_ref" in doc]
+        bodies = await asyncio.gather(*[load_document_content(doc) for doc in offloaded])
+        for doc, body in zip(offloaded, bodies):
+            doc["content"] = body
     
-    lecture["structured_notes"] = await db.structured_notes.find(
-        {"lecture_id": lecture_id}
-    ).to_list(length=None)
-    
-    lecture["documents"] = await db.documents.find(
-        {"lecture_id": lecture_id}
-    ).to_list(length=None)
-    
-    lecture["final_notes"] = await db.final_notes.find_one(
-        {"lecture_id": lecture_id}
-    )
+    lecture["transcriptions"] = transcriptions
+    lecture["structured_notes"] = structured_notes
+    lecture["documents"] = documents
+    lecture["final_notes"] = final_notes
     
     return lecture
 
 async def update_lecture_status(lecture_id: str, status: str) -> None:
     """Update lecture status"""
-    db = get_db()
+    colls = collections()
     
     update_data = {
         "status": status,
@@ -398,17 +869,17 @@ async def update_lecture_status(lecture_id: str, status: str) -> None:
     if status == "completed":
         update_data["completed_at"] = datetime.utcnow()
     
-    await db.lectures.update_one(
-        {"_id": lecture_id},
+    await colls.lectures.update_one(
+        {"_id": _oid(lecture_id)},
         {"$set": update_data}
     )
 
 async def mark_document_processed(document_id: str) -> None:
     """Mark document as processed"""
-    db = get_db()
+    colls = collections()
     
-    await db.documents.update_one(
-        {"_id": document_id},
+    await colls.documents.update_one(
+        {"_id": _oid(document_id)},
         {"$set": {
             "processed": True,
             "processed_at": datetime.utcnow()
@@ -418,14 +889,26 @@ async def mark_document_processed(document_id: str) -> None:
 # Statistics and analytics
 async def get_lecture_stats(lecture_id: str) -> Dict:
     """Get lecture statistics"""
-    db = get_db()
+    colls = collections()
+    
+    query = {"lecture_id": lecture_id}
+    
+    # Independent index-backed counts, issued concurrently (one round-trip of latency)
+    (transcription_count, structured_notes_count, document_count,
+     embedding_count, final_notes_count) = await asyncio.gather(
+        colls.transcriptions.count_documents(query),
+        colls.structured_notes.count_documents(query),
+        colls.documents.count_documents(query),
+        colls.embeddings.count_documents(query),
+        colls.final_notes.count_documents(query, limit=1)
+    )
     
     stats = {
-        "transcription_count": await db.transcriptions.count_documents({"lecture_id": lecture_id}),
-        "structured_notes_count": await db.structured_notes.count_documents({"lecture_id": lecture_id}),
-        "document_count": await db.documents.count_documents({"lecture_id": lecture_id}),
-        "embedding_count": await db.document_embeddings.count_documents({"lecture_id": lecture_id}),
-        "has_final_notes": await db.final_notes.count_documents({"lecture_id": lecture_id}) > 0
+        "transcription_count": transcription_count,
+        "structured_notes_count": structured_notes_count,
+        "document_count": document_count,
+        "embedding_count": embedding_count,
+        "has_final_notes": final_notes_count > 0
     }
     
     return stats
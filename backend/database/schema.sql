@@ -60,7 +60,7 @@ CREATE TABLE IF NOT EXISTS document_chunks (
     lecture_id INTEGER REFERENCES lectures(id) ON DELETE CASCADE,
     chunk_text TEXT NOT NULL,
     chunk_index INTEGER NOT NULL,
-    embedding vector(384), -- 384 dimensions for all-MiniLM-L6-v2
+    embedding halfvec(384), -- 384 dimensions for all-MiniLM-L6-v2, fp16 (pgvector >= 0.7) halves storage/IO
     metadata JSONB DEFAULT '{}',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
@@ -68,10 +68,23 @@ CREATE TABLE IF NOT EXISTS document_chunks (
     CONSTRAINT unique_document_chunk UNIQUE (document_id, chunk_index)
 );
 
+-- Migrate databases created with float32 vector(384) embeddings to halfvec
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'document_chunks' AND column_name = 'embedding' AND udt_name = 'vector'
+    ) THEN
+        DROP INDEX IF EXISTS document_chunks_embedding_idx;
+        ALTER TABLE document_chunks
+            ALTER COLUMN embedding TYPE halfvec(384) USING embedding::halfvec(384);
+    END IF;
+END $$;
+
 -- Create HNSW index for fast vector similarity search
 CREATE INDEX IF NOT EXISTS document_chunks_embedding_idx 
 ON document_chunks 
-USING hnsw (embedding vector_cosine_ops)
+USING hnsw (embedding halfvec_cosine_ops)
 WITH (m = 16, ef_construction = 64);
 
 -- Transcriptions table (20-second audio chunks)
@@ -144,8 +157,9 @@ CREATE TRIGGER update_lectures_updated_at BEFORE UPDATE ON lectures
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 -- Function to search similar document chunks using pgvector
+DROP FUNCTION IF EXISTS search_similar_chunks(vector, INTEGER, INTEGER);
 CREATE OR REPLACE FUNCTION search_similar_chunks(
-    query_embedding vector(384),
+    query_embedding halfvec(384),
     p_lecture_id INTEGER,
     top_k INTEGER DEFAULT 10
 )
@@ -165,7 +179,7 @@ BEGIN
     FROM document_chunks dc
     JOIN documents d ON dc.document_id = d.id
     WHERE dc.lecture_id = p_lecture_id
-    ORDER BY dc.embedding <=> query_embedding
+    ORDER BY dc.embedding <=> query_embedding  -- bare distance ORDER BY + LIMIT lets the planner use the HNSW index
     LIMIT top_k;
 END;
 $$ LANGUAGE plpgsql;
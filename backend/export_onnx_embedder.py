@@ -0,0 +1,32 @@
+"""
+Export the embedding model to ONNX with int8 dynamic quantization.
+Run this once; get_embedder() picks the result up from EMBEDDING_ONNX_DIR.
+
+Requires: pip install -r requirements_onnx.txt
+"""
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+from app.core.config import settings
+
+def export_onnx_embedder(model_name: str = settings.EMBEDDING_MODEL,
+                         output_dir: str = settings.EMBEDDING_ONNX_DIR):
+    """Export model_name to ONNX and write model_quantized.onnx to output_dir."""
+    # sentence-transformers accepts short names; the HF hub needs the org prefix
+    model_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+    print(f"Exporting {model_id} to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(output_dir)
+
+    print("Quantizing to int8 (dynamic, AVX512-VNNI)...")
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+
+    print(f"ONNX embedder saved to {output_dir}")
+
+if __name__ == "__main__":
+    export_onnx_embedder()
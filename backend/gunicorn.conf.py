@@ -0,0 +1,21 @@
+"""
+Gunicorn config for running optimized_main with multiple workers.
+
+    gunicorn -c gunicorn.conf.py optimized_main:app
+
+preload_app imports the app once in the master; when_ready then loads the
+embedding model into shared memory before workers are forked, so N workers
+share one copy of the weights instead of loading N.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8001")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before the first fork."""
+    from app.services.document_processor_mongodb import preload_embedder
+    preload_embedder(share_memory=True)
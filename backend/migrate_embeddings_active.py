@@ -0,0 +1,25 @@
+"""
+One-off migration: mark document embeddings saved before the active flag
+existed as live. Run once after upgrading; searches skip chunks without it.
+"""
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from database.mongodb_connection import init_mongodb, backfill_embeddings_active, close_mongodb
+
+async def main():
+    init_mongodb()
+    try:
+        print("🔄 Backfilling active flag on document embeddings...")
+        updated = await backfill_embeddings_active()
+        print(f"✅ Marked {updated} embeddings active")
+    finally:
+        await close_mongodb()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -14,6 +14,7 @@ from pathlib import Path
 from typing import Dict, List
 import logging
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,18 +34,18 @@ app.add_middleware(
 )
 
 # Import services
+from app.core.config import settings
 from app.services.transcribe_whisper import transcribe_local
-from app.services.document_processor_mongodb import query_documents, process_document  # MongoDB version!
-from app.services.agentic_synthesizer import synthesize_structured_notes, detect_topic_shift
+from app.services.document_processor_mongodb import query_documents, process_document, preload_embedder  # MongoDB version!
+from app.services.agentic_synthesizer import synthesize_structured_notes, detect_topic_shift, is_near_duplicate
 from app.services.importance_scorer import score_importance
 
 # Initialize MongoDB connection
 from database.mongodb_connection import (
     init_mongodb,
-    save_transcription,
+    save_transcriptions_bulk,
     save_structured_notes,
-    save_final_notes,
-    create_lecture
+    save_final_notes
 )
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables
@@ -65,6 +66,10 @@ class OptimizedAudioProcessor:
         self.transcription_buffers = defaultdict(list)  # Store transcriptions
         self.last_synthesis_time = defaultdict(float)   # Track synthesis timing
         self.structured_notes_history = defaultdict(list)  # Store generated notes
+        self.last_synthesized_text = {}  # Speech behind each lecture's latest notes
+        self.pending_transcriptions = defaultdict(list)  # Not yet written to MongoDB
+        self.last_transcription_flush = defaultdict(float)
+        self.next_chunk_index = defaultdict(int)  # Only ever increases (buffers get trimmed)
         
         # Processing queues
         self.audio_queues = defaultdict(asyncio.Queue)
@@ -111,7 +116,7 @@ class OptimizedAudioProcessor:
             while True:
                 # Get next audio chunk from queue
                 logger.info(f"⏳ Waiting for audio chunk in queue for {lecture_id}...")
-                chunk_data = await self.audio_queues[lecture_id].get()
+                chunk_data = await self.next_audio_chunk(lecture_id)
                 logger.info(f"✅ Got audio chunk from queue for {lecture_id}")
                 
                 file_path = chunk_data["file_path"]
@@ -155,7 +160,8 @@ class OptimizedAudioProcessor:
                 )
                 
                 # Save transcription to MongoDB
-                chunk_index = len(self.transcription_buffers[lecture_id]) - 1
+                chunk_index = self.next_chunk_index[lecture_id]
+                self.next_chunk_index[lecture_id] += 1
                 
                 # Score importance (pass dict, not string)
                 importance_result = score_importance({
@@ -164,18 +170,18 @@ class OptimizedAudioProcessor:
                 })
                 importance = importance_result.get("importance", 0.5)
                 
-                try:
-                    await save_transcription(
-                        lecture_id=lecture_id,
-                        chunk_index=chunk_index,
-                        text=transcription_text,
-                        enhanced_notes=enhanced_notes,
-                        timestamp=chunk_data["timestamp"],
-                        importance=importance
-                    )
-                    logger.info(f"✅ Saved transcription to MongoDB: chunk {chunk_index}")
-                except Exception as db_error:
-                    logger.error(f"⚠️  Failed to save transcription to MongoDB: {db_error}")
+                # Buffered; written in one bulk upsert every few chunks
+                self.pending_transcriptions[lecture_id].append({
+                    "lecture_id": lecture_id,
+                    "chunk_index": chunk_index,
+                    "text": transcription_text,
+                    "enhanced_notes": enhanced_notes,
+                    "timestamp": chunk_data["timestamp"],
+                    "importance": importance
+                })
+                if (len(self.pending_transcriptions[lecture_id]) >= settings.TRANSCRIPTION_FLUSH_CHUNKS
+                        or time.time() - self.last_transcription_flush[lecture_id] >= settings.TRANSCRIPTION_FLUSH_SECONDS):
+                    await self.flush_transcriptions(lecture_id)
                 
                 # Send enhanced notes to frontend immediately
                 await websocket.send_json({
@@ -229,6 +235,33 @@ class OptimizedAudioProcessor:
             raise
         except Exception as e:
             logger.error(f"❌ Fatal error in processing task: {e}", exc_info=True)
+        finally:
+            # However the task ends, buffered chunks still reach MongoDB
+            await self.flush_transcriptions(lecture_id)
+    
+    async def next_audio_chunk(self, lecture_id: str) -> dict:
+        """Wait for the next queued chunk, flushing buffered transcriptions once they are TRANSCRIPTION_FLUSH_SECONDS old"""
+        queue = self.audio_queues[lecture_id]
+        while True:
+            if not self.pending_transcriptions.get(lecture_id):
+                return await queue.get()
+            age = time.time() - self.last_transcription_flush[lecture_id]
+            try:
+                return await asyncio.wait_for(queue.get(), timeout=max(0.0, settings.TRANSCRIPTION_FLUSH_SECONDS - age))
+            except asyncio.TimeoutError:
+                await self.flush_transcriptions(lecture_id)
+    
+    async def flush_transcriptions(self, lecture_id: str):
+        """Write buffered transcription chunks to MongoDB in one bulk upsert"""
+        pending = self.pending_transcriptions.pop(lecture_id, [])
+        self.last_transcription_flush[lecture_id] = time.time()
+        if not pending:
+            return
+        try:
+            await save_transcriptions_bulk(pending)
+            logger.info(f"✅ Saved {len(pending)} transcriptions to MongoDB (chunks {pending[0]['chunk_index']}-{pending[-1]['chunk_index']})")
+        except Exception as db_error:
+            logger.error(f"⚠️  Failed to save transcriptions to MongoDB: {db_error}")
     
     async def synthesize_notes(self, lecture_id: str, websocket: WebSocket):
         """Synthesize structured notes from accumulated transcriptions"""
@@ -241,8 +274,15 @@ class OptimizedAudioProcessor:
             if not transcriptions:
                 return
             
-            # Get RAG context from all transcriptions
             combined_text = " ".join([t["text"] for t in transcriptions])
+            
+            # Same speech as the last synthesized window: skip the RAG lookup and Groq call
+            if await is_near_duplicate(combined_text, self.last_synthesized_text.get(lecture_id)):
+                self.last_synthesis_time[lecture_id] = time.time()
+                self.transcription_buffers[lecture_id] = self.transcription_buffers[lecture_id][-1:]
+                return
+            
+            # Get RAG context from all transcriptions
             rag_context = await query_documents(combined_text, lecture_id, top_k=5)
             
             # Get previous structured notes for context
@@ -256,12 +296,19 @@ class OptimizedAudioProcessor:
                 "message": "Generating structured notes..."
             })
             
-            # Synthesize structured notes
+            async def send_delta(delta: str):
+                await websocket.send_json({
+                    "type": "structured_notes_delta",
+                    "content": delta
+                })
+            
+            # Synthesize structured notes, streaming deltas to the frontend as they arrive
             synthesis_result = await synthesize_structured_notes(
                 transcriptions=transcriptions,
                 rag_context=rag_context,
                 lecture_id=lecture_id,
-                previous_structured_notes=previous_notes
+                previous_structured_notes=previous_notes,
+                on_delta=send_delta
             )
             
             if synthesis_result["success"]:
@@ -269,6 +316,7 @@ class OptimizedAudioProcessor:
                 
                 # Store in history
                 self.structured_notes_history[lecture_id].append(structured_notes)
+                self.last_synthesized_text[lecture_id] = combined_text
                 
                 # Save structured notes to MongoDB
                 try:
@@ -329,10 +377,20 @@ class OptimizedAudioProcessor:
             # Import and use final synthesizer
             from app.services.final_synthesizer import synthesize_final_notes
             
+            async def send_section(section):
+                # Sections are pushed as soon as each finishes, before the full document
+                await websocket.send_json({
+                    "type": "final_notes_section",
+                    "index": section["index"],
+                    "title": section["title"],
+                    "content": section["content"]
+                })
+            
             final_result = await synthesize_final_notes(
                 lecture_id=lecture_id,
                 structured_notes_list=all_structured_notes,
-                rag_context=rag_context
+                rag_context=rag_context,
+                on_section=send_section
             )
             
             if final_result["success"]:
@@ -376,6 +434,20 @@ class OptimizedAudioProcessor:
 # Global processor instance
 processor = OptimizedAudioProcessor()
 
+
+@app.on_event("startup")
+async def configure_executor():
+    """Size the default executor used by asyncio.to_thread / run_in_executor"""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=settings.THREAD_POOL_SIZE))
+    logger.info(f"✅ Default thread pool size: {settings.THREAD_POOL_SIZE}")
+
+
+@app.on_event("startup")
+async def warm_embedder():
+    """Load the embedding model now instead of on the first request (no-op if preloaded)"""
+    await asyncio.to_thread(preload_embedder)
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
@@ -535,6 +607,7 @@ async def websocket_endpoint(websocket: WebSocket, lecture_id: str):
             
             elif message.get("type") == "stop_recording":
                 logger.info(f"Stopping recording for lecture {lecture_id}")
+                await processor.flush_transcriptions(lecture_id)
                 
                 # Final synthesis if there are remaining transcriptions
                 if len(processor.transcription_buffers[lecture_id]) > 0:
@@ -551,6 +624,7 @@ async def websocket_endpoint(websocket: WebSocket, lecture_id: str):
             
     except WebSocketDisconnect:
         manager.disconnect(lecture_id)
+        await processor.flush_transcriptions(lecture_id)
         
         # Don't stop task on disconnect - it will be cancelled on reconnect
         # This allows the task to continue processing queued audio
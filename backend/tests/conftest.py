@@ -0,0 +1,9 @@
+"""
+Shared setup for the backend unit tests (no database or API keys needed)
+
+    cd backend && python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
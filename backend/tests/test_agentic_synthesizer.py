@@ -0,0 +1,120 @@
+"""
+synthesize_structured_notes streaming: deltas, timeouts and failed streams
+"""
+import asyncio
+import hashlib
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import agentic_synthesizer as synth
+
+
+def chunk(text):
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    def __init__(self, mode):
+        self.mode = mode
+
+    async def __aiter__(self):
+        yield chunk("## Topic")
+        if self.mode == "fail":
+            raise RuntimeError("connection reset")
+        if self.mode == "stall":
+            await asyncio.sleep(10)
+        yield chunk("\n- point")
+
+
+@pytest.fixture
+def groq(monkeypatch):
+    state = types.SimpleNamespace(mode="ok", calls=0)
+
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        state.calls += 1
+        return FakeStream(state.mode)
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setattr(synth, "async_groq_client", client)
+    monkeypatch.setattr(synth, "_groq_semaphore", None)  # bound per event loop
+
+    async def no_embedding(*args):
+        return None
+    monkeypatch.setattr(synth, "_embed_for_cache", no_embedding)
+    monkeypatch.setattr(synth, "_exact_cache", type(synth._exact_cache)())
+    monkeypatch.setattr(settings, "GROQ_TIMEOUT_SECONDS", 0.5)
+    return state
+
+
+def synthesize(text):
+    deltas = []
+
+    async def on_delta(delta):
+        deltas.append(delta)
+
+    result = asyncio.run(synth.synthesize_structured_notes(
+        [{"text": text}], [], "lecture-1", previous_structured_notes=None, on_delta=on_delta
+    ))
+    return result, deltas
+
+
+def test_deltas_are_forwarded_and_joined(groq):
+    result, deltas = synthesize("gradient descent. learning rate")
+    assert deltas == ["## Topic", "\n- point"]
+    assert result["structured_notes"] == "## Topic\n- point"
+    assert result["fallback"] is False
+
+
+@pytest.mark.parametrize("mode", ["fail", "stall"])
+def test_broken_stream_returns_fallback_not_partial_text(groq, mode):
+    groq.mode = mode
+    result, deltas = synthesize("gradient descent. learning rate")
+
+    assert deltas == ["## Topic"]
+    assert result["fallback"] is True
+    assert result["structured_notes"] == synth._fallback_synthesis("gradient descent. learning rate")
+
+
+def test_partial_text_is_not_cached(groq):
+    groq.mode = "fail"
+    synthesize("same window")
+    groq.mode = "ok"
+    result, _ = synthesize("same window")
+    assert result["structured_notes"] == "## Topic\n- point"
+    assert groq.calls == 2
+
+
+class HashEmbedder:
+    """Unit vector per distinct text, so only identical windows score 1.0"""
+
+    def encode(self, texts, show_progress_bar=False, normalize_embeddings=True):
+        rows = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+            row = np.random.default_rng(seed).standard_normal(16)
+            rows.append(row / np.linalg.norm(row))
+        return np.array(rows, dtype=np.float32)
+
+
+def test_semantic_cache_compares_every_window_of_every_field(monkeypatch):
+    fake = types.SimpleNamespace(get_embedder=HashEmbedder)
+    monkeypatch.setitem(sys.modules, "app.services.document_processor_mongodb", fake)
+    monkeypatch.setattr(synth, "_semantic_cache", type(synth._semantic_cache)(maxlen=8))
+
+    head = "x" * synth.WINDOW_CHARS
+    stored = asyncio.run(synth._embed_for_cache(head + "early ending", ["context"], "notes"))
+    synth._store_in_cache("key", stored, "cached notes")
+
+    def lookup(transcription, context, notes):
+        return synth._lookup_semantic_cache(asyncio.run(synth._embed_for_cache(transcription, context, notes)))
+
+    assert lookup(head + "early ending", ["context"], "notes") == "cached notes"
+    # Same first window (all the embedder would see in one call), different tail
+    assert lookup(head + "later ending", ["context"], "notes") is None
+    assert lookup(head + "early ending", ["other context"], "notes") is None
+    assert lookup(head + "early ending", ["context"], None) is None
@@ -0,0 +1,72 @@
+"""
+chunk_text / _split_complete_chunks against the original split/join chunker
+"""
+import random
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app.services.document_processor_mongodb import chunk_text, _split_complete_chunks
+
+
+def baseline_chunk_text(text, chunk_size=300):
+    """The chunker before word offsets (words re-joined with single spaces)"""
+    words = text.split()
+    return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
+
+
+def random_text(rng, words):
+    separators = [" ", "  ", "\n", "\t", " \n ", " ", "　"]
+    return "".join(f"w{rng.randint(0, 99)}{rng.choice(separators)}" for _ in range(words))
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "   \n\t ",
+    "one",
+    "  leading and trailing  ",
+    "é ü ñ 日本 語",
+])
+def test_chunk_text_matches_baseline_words_on_edge_cases(text):
+    assert [chunk.split() for chunk in chunk_text(text, chunk_size=2)] == \
+        [chunk.split() for chunk in baseline_chunk_text(text, chunk_size=2)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunk_text_matches_baseline_words(seed):
+    rng = random.Random(seed)
+    text = random_text(rng, rng.randint(0, 2000))
+    for chunk_size in (1, 7, 300):
+        chunks = chunk_text(text, chunk_size=chunk_size)
+        assert [chunk.split() for chunk in chunks] == \
+            [chunk.split() for chunk in baseline_chunk_text(text, chunk_size)]
+
+
+def test_chunk_text_preserves_original_slices():
+    text = "alpha  beta\ngamma\tdelta epsilon"
+    assert chunk_text(text, chunk_size=2) == ["alpha  beta", "gamma\tdelta", "epsilon"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_split_complete_chunks_streams_like_chunk_text(seed):
+    rng = random.Random(seed)
+    segments = [random_text(rng, rng.randint(0, 700)) for _ in range(12)]
+
+    # Same feeding pattern as process_document's chunk stage
+    tail = ""
+    streamed = []
+    for segment in filter(None, segments):
+        chunks, tail = _split_complete_chunks(f"{tail}\n{segment}" if tail else segment, 300)
+        streamed.extend(chunks)
+    streamed.extend(chunk_text(tail, chunk_size=300))
+
+    assert streamed == chunk_text("\n".join(filter(None, segments)), chunk_size=300)
+
+
+def test_split_complete_chunks_holds_back_the_last_chunk():
+    chunks, tail = _split_complete_chunks("a b c d e", 2)
+    assert chunks == ["a b", "c d"]
+    assert tail == "e"
+    assert _split_complete_chunks("   ", 2) == ([], "")
@@ -0,0 +1,167 @@
+"""
+process_document's streaming extract/chunk/embed/save pipeline, with the
+MongoDB helpers and the model replaced by in-memory fakes
+"""
+import asyncio
+import hashlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+
+from app.services import document_processor_mongodb as dp
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.texts = 0
+
+    def encode(self, texts, **kwargs):
+        self.texts += len(texts)
+        rows = [np.frombuffer(hashlib.sha256(t.encode()).digest(), dtype=np.uint8)[:8].astype(np.float32) + 1
+                for t in texts]
+        return np.stack([row / np.linalg.norm(row) for row in rows])
+
+
+class FakeStore:
+    """Records every MongoDB helper call process_document makes"""
+
+    def __init__(self, monkeypatch, save_delay=0.0):
+        self.events = []
+        self.documents = {}
+        self.embeddings = []
+        self.cache = {}
+        self.save_delay = save_delay
+        for name in ("save_document", "set_document_content", "delete_document",
+                     "save_document_embeddings", "mark_document_processed",
+                     "get_cached_embeddings", "cache_embeddings"):
+            monkeypatch.setattr(dp, name, getattr(self, name))
+
+    async def save_document(self, **fields):
+        self.events.append("create")
+        self.documents["doc-1"] = fields
+        return "doc-1"
+
+    async def set_document_content(self, document_id, lecture_id, filename, content):
+        self.events.append("content")
+        self.documents[document_id]["content"] = content
+
+    async def delete_document(self, document_id, lecture_id):
+        self.events.append("delete")
+        self.documents.pop(document_id, None)
+
+    async def save_document_embeddings(self, rows):
+        self.events.append("embeddings")
+        await asyncio.sleep(self.save_delay)
+        self.embeddings.extend(rows)
+
+    async def mark_document_processed(self, document_id):
+        self.events.append("processed")
+
+    async def get_cached_embeddings(self, keys):
+        return {key: self.cache[key] for key in keys if key in self.cache}
+
+    async def cache_embeddings(self, entries, model):
+        self.cache.update(entries)
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    embedder = FakeEmbedder()
+    monkeypatch.setattr(dp, "get_embedder", lambda: embedder)
+    # The batcher's queue binds to the loop that first uses it; one per test
+    monkeypatch.setattr(dp, "_batcher", dp.EmbeddingBatcher(window_ms=0, max_batch=32))
+    return embedder
+
+
+def use_segments(monkeypatch, segments, events=None):
+    def iter_segments(file_path, extractor):
+        yield from segments
+        if events is not None:
+            events.append("extracted")
+    monkeypatch.setattr(dp, "_iter_text_segments", iter_segments)
+
+
+def page(n, words=3000):
+    return " ".join(f"p{n}w{i}" for i in range(words))
+
+
+def run(coro, timeout=60):
+    return asyncio.run(asyncio.wait_for(coro, timeout))
+
+
+def test_large_document_fills_every_queue_without_stalling(monkeypatch, embedder):
+    # 60 segments -> 600 chunks -> ~19 embed batches, far more than PIPELINE_QUEUE_SIZE
+    store = FakeStore(monkeypatch, save_delay=0.005)
+    segments = [page(n) for n in range(60)]
+    use_segments(monkeypatch, segments, store.events)
+
+    result = run(dp.process_document("lecture.txt", "lecture-1", "lecture.txt"))
+
+    text = "\n".join(segments)
+    assert result == {"success": True, "document_id": "doc-1", "chunk_count": 600, "text_length": len(text)}
+    assert [row["chunk_text"] for row in store.embeddings] == dp.chunk_text(text, chunk_size=300)
+    assert [row["chunk_index"] for row in store.embeddings] == list(range(600))
+    assert {row["document_id"] for row in store.embeddings} == {"doc-1"}
+    assert store.documents["doc-1"]["content"] == text
+    # Saving overlaps extraction; the body is stored once it is complete
+    assert store.events[0] == "create"
+    assert store.events.index("embeddings") < store.events.index("extracted")
+    assert store.events[-2:] == ["content", "processed"]
+
+
+def test_short_document_is_rejected_without_embedding(monkeypatch, embedder):
+    store = FakeStore(monkeypatch)
+    use_segments(monkeypatch, ["too short"])
+
+    result = run(dp.process_document("notes.txt", "lecture-1", "notes.txt"))
+
+    assert result["success"] is False
+    assert store.events == ["create", "delete"]
+    assert store.documents == {}
+    assert embedder.texts == 0
+
+
+def test_failed_stage_removes_the_partial_document(monkeypatch, embedder):
+    store = FakeStore(monkeypatch)
+    use_segments(monkeypatch, [page(n) for n in range(10)])
+
+    async def failing_save(rows):
+        raise RuntimeError("write failed")
+    monkeypatch.setattr(dp, "save_document_embeddings", failing_save)
+
+    with pytest.raises(RuntimeError, match="write failed"):
+        run(dp.process_document("lecture.txt", "lecture-1", "lecture.txt"))
+    assert store.events == ["create", "delete"]
+
+
+def test_rerun_reuses_cached_embeddings(monkeypatch, embedder):
+    store = FakeStore(monkeypatch)
+    use_segments(monkeypatch, [page(n) for n in range(5)])
+
+    async def ingest_twice():
+        await dp.process_document("lecture.txt", "lecture-1", "lecture.txt")
+        first = [row["embedding"] for row in store.embeddings]
+        encoded = embedder.texts
+        store.embeddings.clear()
+        await dp.process_document("lecture.txt", "lecture-1", "lecture.txt")
+        return first, encoded
+
+    first, encoded = run(ingest_twice())
+
+    assert encoded == 50
+    assert embedder.texts == encoded  # second run never reached the model
+    np.testing.assert_array_equal(np.stack(first), np.stack([row["embedding"] for row in store.embeddings]))
+
+
+def test_repeated_chunks_are_embedded_once(monkeypatch, embedder):
+    store = FakeStore(monkeypatch)
+    boilerplate = page("footer", words=300)
+    use_segments(monkeypatch, [boilerplate] * 40)
+
+    result = run(dp.process_document("slides.txt", "lecture-1", "slides.txt"))
+
+    assert result["chunk_count"] == 40
+    assert embedder.texts == 1
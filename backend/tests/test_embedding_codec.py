@@ -0,0 +1,62 @@
+"""
+encode_embedding / decode_embedding and NumpyCodec round trips through BSON
+"""
+import bson
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from database import mongodb_connection as mongo
+
+
+@pytest.fixture
+def vector():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=384).astype(np.float32)
+
+
+def bson_round_trip(document):
+    data = bson.encode(document, codec_options=mongo.EMBEDDING_CODEC_OPTIONS)
+    return bson.decode(data, codec_options=mongo.EMBEDDING_CODEC_OPTIONS)
+
+
+@pytest.mark.parametrize("dtype, atol", [
+    ("float32", 1e-7),
+    ("array", 1e-7),
+    ("float16", 1e-3),
+    ("int8", 1e-2),
+])
+def test_round_trip_is_unit_length_and_close(monkeypatch, vector, dtype, atol):
+    monkeypatch.setattr(settings, "EMBEDDING_STORAGE_DTYPE", dtype)
+    decoded = mongo.decode_embedding(bson_round_trip(mongo.encode_embedding(vector)))
+
+    expected = vector / np.linalg.norm(vector)
+    assert decoded.dtype == np.float32
+    assert decoded.shape == (384,)
+    np.testing.assert_allclose(decoded, expected, atol=atol)
+
+
+def test_float32_is_stored_as_bindata_vector(monkeypatch, vector):
+    monkeypatch.setattr(settings, "EMBEDDING_STORAGE_DTYPE", "float32")
+    raw = bson.decode(bson.encode(mongo.encode_embedding(vector), codec_options=mongo.EMBEDDING_CODEC_OPTIONS))
+
+    assert raw["embedding"].subtype == mongo.VECTOR_SUBTYPE
+    assert raw["embedding"][:2] == mongo.FLOAT32_VECTOR_HEADER
+    assert len(raw["embedding"]) == 2 + 384 * 4
+
+
+def test_codec_leaves_other_binaries_alone():
+    decoded = bson_round_trip({"blob": bson.Binary(b"\x27\x00abcd")})
+    assert decoded["blob"] == b"\x27\x00abcd"
+
+
+def test_decodes_raw_float32_bytes_written_before_bindata():
+    vector = np.arange(4, dtype=np.float32)
+    decoded = mongo.decode_embedding({"embedding": vector.tobytes(), "embedding_dtype": "float32"})
+    np.testing.assert_array_equal(decoded, vector)
+
+
+def test_zero_vector_does_not_divide_by_zero(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_STORAGE_DTYPE", "float32")
+    decoded = mongo.decode_embedding(bson_round_trip(mongo.encode_embedding(np.zeros(8))))
+    assert np.all(np.isfinite(decoded))
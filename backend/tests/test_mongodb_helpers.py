@@ -0,0 +1,112 @@
+"""
+MongoDB CRUD helpers against in-memory fake collections
+"""
+import asyncio
+import types
+
+from database import mongodb_connection as mongo
+
+
+class FakeCollection:
+    def __init__(self):
+        self.calls = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.calls.append(("bulk_write", ops, ordered))
+        return types.SimpleNamespace(upserted_count=len(ops), modified_count=0)
+
+
+def use_collections(monkeypatch, **colls):
+    monkeypatch.setattr(mongo, "collections", lambda: types.SimpleNamespace(**colls))
+
+
+def transcription(chunk_index, text):
+    return {"lecture_id": "lecture-1", "chunk_index": chunk_index, "text": text,
+            "enhanced_notes": "", "timestamp": "t", "importance": 0.5}
+
+
+def test_bulk_transcriptions_keep_the_last_write_per_chunk(monkeypatch):
+    transcriptions = FakeCollection()
+    use_collections(monkeypatch, transcriptions=transcriptions)
+
+    written = asyncio.run(mongo.save_transcriptions_bulk([
+        transcription(0, "old"), transcription(1, "other"), transcription(0, "new")
+    ]))
+
+    (_, ops, _), = transcriptions.calls
+    texts = {op._filter["chunk_index"]: op._doc["$set"]["text"] for op in ops}
+    assert texts == {0: "new", 1: "other"}
+    assert written == 2
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeEmbeddings(FakeCollection):
+    def __init__(self, docs):
+        super().__init__()
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        if "_id" in query:
+            wanted = set(query["_id"]["$in"])
+            return FakeCursor([doc for doc in self.docs if doc["_id"] in wanted])
+        return FakeCursor([doc for doc in self.docs if doc["lecture_id"] == query["lecture_id"]])
+
+    async def delete_many(self, query):
+        self.docs = [doc for doc in self.docs
+                     if not all(doc.get(key) == value for key, value in query.items())]
+
+
+class FakeDocuments(FakeCollection):
+    async def delete_one(self, query):
+        self.calls.append(("delete_one", query))
+
+
+def embedding(chunk_id, document_id, vector):
+    return {"_id": chunk_id, "lecture_id": "lecture-1", "document_id": document_id,
+            "chunk_text": f"text {chunk_id}", "embedding": vector, "active": True}
+
+
+def test_search_skips_rows_deleted_after_the_matrix_was_cached(monkeypatch):
+    embeddings = FakeEmbeddings([embedding("a", "doc-1", [1.0, 0.0]),
+                                 embedding("b", "doc-2", [0.9, 0.1])])
+    use_collections(monkeypatch, embeddings=embeddings)
+    monkeypatch.setattr(mongo, "_matrix_cache", mongo.OrderedDict())
+
+    first = asyncio.run(mongo.simple_vector_search([1.0, 0.0], "lecture-1", top_k=2))
+    assert [hit["chunk_id"] for hit in first] == ["a", "b"]
+
+    # Deleted behind the cache's back: the stale row must not come back as ""
+    embeddings.docs = embeddings.docs[1:]
+    stale = asyncio.run(mongo.simple_vector_search([1.0, 0.0], "lecture-1", top_k=2))
+    assert [hit["chunk_text"] for hit in stale] == ["text b"]
+
+
+def test_delete_document_drops_the_cached_lecture_matrix(monkeypatch):
+    document_id = "6552f0b5e4b0a1a2b3c4d5e6"
+    embeddings = FakeEmbeddings([embedding("a", document_id, [1.0, 0.0]),
+                                 embedding("b", "doc-2", [0.0, 1.0])])
+    use_collections(monkeypatch, embeddings=embeddings, documents=FakeDocuments())
+    monkeypatch.setattr(mongo, "_matrix_cache", mongo.OrderedDict())
+
+    asyncio.run(mongo.simple_vector_search([1.0, 0.0], "lecture-1"))
+    assert "lecture-1" in mongo._matrix_cache
+
+    asyncio.run(mongo.delete_document(document_id, "lecture-1"))
+    assert "lecture-1" not in mongo._matrix_cache
+
+    hits = asyncio.run(mongo.simple_vector_search([1.0, 0.0], "lecture-1", top_k=5))
+    assert [hit["chunk_id"] for hit in hits] == ["b"]
@@ -0,0 +1,118 @@
+"""
+SemanticPromptCache hit / miss / TTL behaviour with a deterministic embedder
+"""
+import asyncio
+import hashlib
+import pickle
+
+import numpy as np
+import pytest
+
+from app.services import semantic_prompt_cache as spc
+
+
+async def fake_embed(texts):
+    """One unit vector per distinct window text (identical text -> cosine 1, else ~0)"""
+    rows = []
+    for text in texts:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+        row = np.random.default_rng(seed).normal(size=64).astype(np.float32)
+        rows.append(row / np.linalg.norm(row))
+    return np.stack(rows)
+
+
+@pytest.fixture(params=[True, False], ids=["faiss", "numpy"])
+def cache(request, tmp_path, monkeypatch):
+    if request.param and not spc.FAISS_AVAILABLE:
+        pytest.skip("faiss not installed")
+    monkeypatch.setattr(spc, "FAISS_AVAILABLE", request.param)
+    cache = spc.SemanticPromptCache(str(tmp_path / "cache.pkl"), threshold=0.95, ttl=3600)
+    monkeypatch.setattr(cache, "_embed", fake_embed)
+    return cache
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return f"response {self.calls}"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_same_prompt_hits(cache):
+    compute = Counter()
+    first = run(cache.get_or_compute("system", "user prompt", compute))
+    second = run(cache.get_or_compute("system", "user prompt", compute))
+    assert first == second == "response 1"
+    assert compute.calls == 1
+
+
+def test_other_system_prompt_misses(cache):
+    compute = Counter()
+    run(cache.get_or_compute("system A", "user prompt", compute))
+    assert run(cache.get_or_compute("system B", "user prompt", compute)) == "response 2"
+
+
+def test_difference_past_the_first_window_misses(cache):
+    compute = Counter()
+    shared = "x" * spc.WINDOW_CHARS
+    run(cache.get_or_compute("system", shared + "old notes", compute))
+    assert run(cache.get_or_compute("system", shared + "new notes", compute)) == "response 2"
+    assert run(cache.get_or_compute("system", shared, compute)) == "response 3"  # fewer windows
+
+
+def test_near_identical_prompt_hits_semantically(cache, monkeypatch):
+    compute = Counter()
+    run(cache.get_or_compute("system", "user prompt", compute))
+
+    async def similar_embed(texts):
+        return await fake_embed(["user prompt" for _ in texts])
+
+    monkeypatch.setattr(cache, "_embed", similar_embed)
+    assert run(cache.get_or_compute("system", "user prompt!", compute)) == "response 1"
+    assert run(cache.get_or_compute("system", "user prompt!", compute, exact=True)) == "response 2"
+
+
+def test_expired_entries_miss(cache, monkeypatch):
+    compute = Counter()
+    now = [1000.0]
+    monkeypatch.setattr(spc.time, "time", lambda: now[0])
+
+    run(cache.get_or_compute("system", "user prompt", compute))
+    now[0] += 3599
+    assert run(cache.get_or_compute("system", "user prompt", compute)) == "response 1"
+    now[0] += 2
+    assert run(cache.get_or_compute("system", "user prompt", compute)) == "response 2"
+
+
+def test_entries_persist_across_instances(cache, tmp_path, monkeypatch):
+    compute = Counter()
+    run(cache.get_or_compute("system", "user prompt", compute))
+
+    reloaded = spc.SemanticPromptCache(cache.path, threshold=0.95, ttl=3600)
+    monkeypatch.setattr(reloaded, "_embed", fake_embed)
+    assert run(reloaded.get_or_compute("system", "user prompt", compute)) == "response 1"
+    assert compute.calls == 1
+
+
+def test_old_pickle_layout_is_ignored(tmp_path, monkeypatch):
+    path = tmp_path / "old.pkl"
+    path.write_bytes(pickle.dumps({"key": {"embeddings": np.zeros((1, 64)), "responses": ["stale"], "created": [0.0]}}))
+
+    cache = spc.SemanticPromptCache(str(path))
+    monkeypatch.setattr(cache, "_embed", fake_embed)
+    assert run(cache.get_or_compute("system", "user prompt", Counter())) == "response 1"
+
+
+def test_max_entries_keeps_newest(cache):
+    cache.max_entries = 2
+    compute = Counter()
+    for prompt in ("a", "b", "c"):
+        run(cache.get_or_compute("system", prompt, compute))
+    assert run(cache.get_or_compute("system", "c", compute)) == "response 3"
+    assert run(cache.get_or_compute("system", "a", compute)) == "response 4"
@@ -71,6 +71,7 @@ export default function LiveLecture() {
   const [transcriptionChunks, setTranscriptionChunks] = useState([])
   const [rawNotes, setRawNotes] = useState([])
   const [liveNotes, setLiveNotes] = useState([])
+  const [streamingNotes, setStreamingNotes] = useState('')  // Structured notes being streamed
   const [finalNotes, setFinalNotes] = useState(null)  // Final comprehensive notes
   const [audioLevel, setAudioLevel] = useState(0)
   const [lectureTitle, setLectureTitle] = useState('')
@@ -180,9 +181,14 @@ export default function LiveLecture() {
         console.log('🤖 Synthesis started')
         toast.loading('Generating structured notes...', { id: 'synthesis' })
         
+      } else if (data.type === 'structured_notes_delta') {
+        // Partial structured notes while the LLM is still generating
+        setStreamingNotes(prev => prev + data.content)
+        
       } else if (data.type === 'structured_notes') {
         // Structured notes (every 60 seconds)
         console.log('📚 Structured notes received:', data.content)
+        setStreamingNotes('')
         
         const newNote = {
           id: data.timestamp,
@@ -204,6 +210,7 @@ export default function LiveLecture() {
         
       } else if (data.type === 'synthesis_error') {
         console.error('Synthesis error:', data.error)
+        setStreamingNotes('')
         toast.error('Error generating notes', { id: 'synthesis' })
         
       } else if (data.type === 'connection_confirmed') {
@@ -220,6 +227,10 @@ export default function LiveLecture() {
         console.log('🎓 Final synthesis started')
         toast.loading('Creating comprehensive final notes...', { id: 'final-synthesis', duration: 10000 })
         
+      } else if (data.type === 'final_notes_section') {
+        console.log('📄 Final notes section ready:', data.title)
+        toast.loading(`Final notes: "${data.title}" ready...`, { id: 'final-synthesis', duration: 10000 })
+        
       } else if (data.type === 'final_notes') {
         console.log('📚 Final comprehensive notes received:', data)
         
@@ -565,7 +576,7 @@ export default function LiveLecture() {
           </div>
           
           <div className="h-96 overflow-y-auto p-4 bg-secondary-50 rounded-lg">
-            {liveNotes.length === 0 ? (
+            {liveNotes.length === 0 && !streamingNotes ? (
               <div className="flex items-center justify-center h-full text-secondary-500">
                 <div className="text-center">
                   <FileText className="w-12 h-12 mx-auto mb-4 opacity-50" />
@@ -698,6 +709,16 @@ export default function LiveLecture() {
                     </div>
                   </div>
                 ))}
+                
+                {/* Structured notes currently being generated */}
+                {streamingNotes && (
+                  <div className="bg-white p-6 rounded-lg border-2 border-dashed border-primary-200 shadow-sm">
+                    <span className="text-xs bg-primary-100 text-primary-700 px-2 py-1 rounded-full">
+                      ✍️ Generating...
+                    </span>
+                    <div className="text-secondary-800 whitespace-pre-wrap mt-3">{streamingNotes}</div>
+                  </div>
+                )}
               </div>
             )}
           </div>